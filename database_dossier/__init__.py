@@ -16,6 +16,7 @@
     along with this program.  If not, see <https://www.gnu.org/licenses/>.
 """
 
+import time
 from datetime import datetime
 from PyQt5.QtWidgets import *
 from PyQt5.Qt import QStandardItemModel, QTextDocument, QStandardItem
@@ -27,6 +28,17 @@ from . import syntax_highlighter
 from .store import *
 from .updater import show_please_update
 from .database import ConnectionList, DatabaseException, test_connection
+from .database import find_connection_database_table_from_index, item_type_from_index
+from .database import show_connection_error
+from .executor import QueryExecutor, QueryJob
+from .ui.types.text_document import split_sql_statements
+from .history import QueryHistory, HistoryEntry
+from .timings import TimingHistory, format_seconds, format_count, format_bytes
+from .result_set import ColumnarResultSet
+from . import result_cache, export, diff, explain
+from .paging import KeysetPager, key_columns, long_columns
+from .quoting import sql_literal, quote_identifier
+from .filters import filter_sql
 
 class MainWindow(QMainWindow, WindowMixin):
     table_views = [
@@ -48,7 +60,19 @@ class MainWindow(QMainWindow, WindowMixin):
             'number' : QVariant(QColor(
                 Qt.green if self.is_dark else Qt.darkGreen
             )),
-            'date'   : QVariant(QColor(255, 0, 255))
+            'date'   : QVariant(QColor(255, 0, 255)),
+            'added'  : QVariant(QColor(
+                QColor(30, 90, 30) if self.is_dark else QColor(210, 245, 210)
+            )),
+            'removed' : QVariant(QColor(
+                QColor(100, 30, 30) if self.is_dark else QColor(250, 215, 215)
+            )),
+            'changed_row' : QVariant(QColor(
+                QColor(80, 70, 20) if self.is_dark else QColor(250, 245, 205)
+            )),
+            'changed' : QVariant(QColor(
+                QColor(130, 110, 20) if self.is_dark else QColor(245, 220, 120)
+            ))
         }
 
         return self._record_set_colors
@@ -62,8 +86,51 @@ class MainWindow(QMainWindow, WindowMixin):
         self.load_xml('main_window.ui')
         self.extra_ui_file_name = 'extra.ui'
         self.result_sets = {}
+        self.tab_titles = {}
+        self.timings = TimingHistory()
+        self.history = QueryHistory(history_path)
+        self.history_entries = []
+        self.result_cache = result_cache.ResultCache()
+        self.cache_hits = {}
+        self.pager = None
+        self.paged_table_name = None
+        self.prefetched = None
+        self.preview_loaded = False
+        self.table_columns = {}
+        self.data_order = None
+        self.data_filters = []
+        self.proxy_models = {}
+        self.table_sizes = {}
+        self.tab_sql = {}
+        self.guarded = None
+        self.paint_pending = {}
+        self.timing_pending = {}
+        self.viewports = {}
         self.diagram = None
+        self.setup_executor()
         self.connection_dialog = ConnectionDialog(self, test_connection)
+        self.plan_dialog = PlanDialog(self, lambda sql, on_finished:
+            self.run_internal('plan', sql, on_finished)
+        )
+        self.export_dialog = ExportDialog(self, lambda:
+            self.executor.kill('export')
+        )
+        self.import_dialog = ImportDialog(self, self.start_import, lambda:
+            self.executor.kill('import')
+        )
+        self.import_target = None
+        self.value_dialog = ValueDialog(self)
+        self.profile_dialog = ProfileDialog(self, lambda:
+            self.executor.kill('profile')
+        )
+        self.diff_dialog = DiffDialog(self, self.start_diff, self.stop_diff)
+        self.result_diff = None
+        self.diff_models = None
+        self.script_dialog = ScriptDialog(
+            self,
+            self.record_set_colors,
+            lambda: self.executor.cancel('script')
+        )
         self.setup_text_editor()
         self.setup()
         self._record_set_colors = None
@@ -73,6 +140,36 @@ class MainWindow(QMainWindow, WindowMixin):
         self.result_sets[name] = TableModel(self.record_set_colors)
         table_view = self.f('table_view_' + name)
         table_view.setModel(self.result_sets[name])
+        header = FilterHeader(table_view)
+
+        # The data tab sorts and filters on the server, query results
+        # can only be sorted and filtered as they are
+        if name == 'data':
+            header.setSortIndicatorShown(True)
+            header.sectionClicked.connect(self.sort_data)
+            header.filters_changed.connect(lambda: self.filter_data(header))
+        elif name == 'schema':
+            header.set_filtering(False)
+        else:
+            proxy_model = FilterProxyModel()
+            proxy_model.setSourceModel(self.result_sets[name])
+            proxy_model.timed.connect(self.log_proxy_time)
+            self.proxy_models[name] = proxy_model
+
+            header.setSortIndicatorShown(True)
+            header.sectionClicked.connect(lambda col: self.sort_results(name, col))
+            header.filters_changed.connect(lambda:
+                proxy_model.set_filters(header.filters())
+            )
+
+            # A new result isn't sorted or filtered
+            self.result_sets[name].modelReset.connect(header.clear_filters)
+            self.result_sets[name].modelReset.connect(lambda:
+                header.setSortIndicator(-1, Qt.AscendingOrder)
+            )
+        table_view.doubleClicked.connect(lambda index: self.view_value())
+        self.viewports[table_view.viewport()] = name
+        table_view.viewport().installEventFilter(self)
         table_view.setContextMenuPolicy(Qt.CustomContextMenu)
 
         table_view.customContextMenuRequested.connect(lambda:
@@ -82,54 +179,304 @@ class MainWindow(QMainWindow, WindowMixin):
         )
 
 
+    def current_cell(self):
+        """(tab name, TableModel, row, column) of the current tab's
+        current cell, as it is in the model when sorted or filtered"""
+        name = self.tab_name_from_index(self.tab_result_sets.currentIndex())
+        index = self.f('table_view_' + name).currentIndex()
+        if not index.isValid():
+            return None
+
+        if isinstance(index.model(), FilterProxyModel):
+            index = index.model().mapToSource(index)
+
+        table_model = self.result_sets[name]
+        if table_model.record_set is None:
+            return None
+
+        return (name, table_model, index.row(), index.column())
+
+
     def copy_cell(self):
-        table_view = self.f(
-            self.table_views[self.tab_result_sets.currentIndex()]
+        """The value as it was read, not as it is shown"""
+        cell = self.current_cell()
+        if not cell:
+            return None
+
+        name, table_model, row, col = cell
+        value = table_model.record_set.value(row, col)
+        if isinstance(value, (bytes, bytearray)):
+            value = bytes(value).decode('utf-8', 'replace')
+
+        QApplication.instance().clipboard().setText(
+            'null' if value is None else str(value)
         )
 
-        QApplication.instance().clipboard().setText(str(
-            table_view.currentIndex().data()
-        ))
+
+    def view_value(self):
+        """
+        Data tab pages have only the start of long text and binary values,
+        those are read whole by the key of their row
+        """
+        cell = self.current_cell()
+        if not cell:
+            return None
+
+        name, table_model, row, col = cell
+        column = table_model.headers[col]
+        value = table_model.record_set.value(row, col)
+        title = '%s, row %d' % (column, row + 1)
+        pager = self.pager
+
+        if name == 'data' and pager and pager.is_keyset and pager.is_prefix(column, value):
+            try:
+                key_values = [table_model.record_set.value(row, table_model.headers.index(key))
+                    for key in pager.key]
+            except ValueError:
+                key_values = None
+
+            if key_values is not None:
+                def finished(job):
+                    if job.is_error:
+                        self.value_dialog.error(str(job.record_set[0][0]))
+                    elif not job.record_set:
+                        self.value_dialog.error('The row is no longer there')
+                    else:
+                        self.value_dialog.show_value(title, job.record_set[0][0])
+
+                self.value_dialog.loading(title)
+                self.run_internal('data_value', pager.value_sql(column, key_values), finished)
+                return None
+
+        self.value_dialog.show_value(title, value)
 
 
     def log_line(self, sql):
-        old_text = self.text_edit_log.toPlainText()
-        prefix = '\n' if self.text_edit_log.toPlainText() else ''
-        self.text_edit_log.setText(old_text + prefix + sql)
+        self.log_pane.append(sql)
 
 
-    def execute_update_table_model(self, table_model, sql):
-        table_model.is_error = False
-        table_model.headers = ['Result']
-        table_model.record_set = [['OK']]
+    def setup_executor(self):
+        self.executor = QueryExecutor()
+        self.executor.bind('state_changed', self.show_job_state)
+        self.executor.bind('finished', self.update_table_model)
+        self.executor.bind('rows', self.stream_table_model)
 
-        try:
-            cursor = self.connections.execute_active_connection_cursor(sql)
-            if cursor.description:
-                table_model.headers = [i[0] for i in cursor.description]
-                table_model.record_set = cursor.fetchall()
-        except DatabaseException as e:
-            table_model.headers = ['Error']
-            table_model.record_set = [[str(e)]]
-            table_model.is_error = True
 
-        prefix = '\n' if self.text_edit_log.toPlainText() else ''
+    def tab_index_from_name(self, name):
+        return self.table_views.index('table_view_' + name)
+
+
+    def tab_name_from_index(self, tab_index):
+        return self.table_views[tab_index][len('table_view_'):]
+
+
+    def set_tab_title(self, name, title):
+        self.tab_titles[name] = title
+        self.show_job_state(self.executor.jobs.get(name), name)
+
+
+    def show_job_state(self, job, name=None):
+        if name is None:
+            name = job.name
+
+        if name not in self.result_sets:
+            return None
+
+        tab_index = self.tab_index_from_name(name)
+        if name not in self.tab_titles:
+            self.tab_titles[name] = self.tab_result_sets.tabText(tab_index)
+
+        title = self.tab_titles[name]
+        if name in self.cache_hits:
+            title+= ' (cached %ds ago)' % self.cache_hits[name].age
+        elif job and job.state != job.state_done:
+            title+= ' (%s)' % job.state
+        elif job and job.truncated:
+            title+= ' (truncated at %d MB)' % self.state.result_memory_limit_mb
+
+        self.tab_result_sets.setTabText(tab_index, title)
+
+        if tab_index == self.tab_result_sets.currentIndex():
+            self.show_timing()
+
+
+    def add_timing(self, timing):
+        self.timings.add(timing)
+        self.history.add(timing)
+        if self.table_query.currentWidget() is self.tab_history:
+            self.history_search_timer.start()
+
 
-        self.text_edit_log.setText(
-            self.text_edit_log.toPlainText() + prefix + sql
+    def show_timing(self):
+        name = self.tab_name_from_index(self.tab_result_sets.currentIndex())
+        job = self.executor.jobs.get(name)
+
+        if job is None:
+            self.label_timing.setText('')
+            self.label_timing.setToolTip('')
+        else:
+            self.label_timing.setText(job.timing.summary())
+            self.label_timing.setToolTip(job.timing.describe())
+
+
+    def time_model(self, job, started):
+        """Add the time spent filling the model, and wait for it to paint"""
+        job.timing.add('model', time.perf_counter() - started)
+
+        pending = self.paint_pending.get(job.name)
+        if pending and pending[0] is not job:
+            # Replaced before it painted, it's kept without a paint time
+            self.paint_pending.pop(job.name)
+            self.record_timing_pending(job.name)
+
+        if not job.timing.seconds['paint'] and job.name not in self.paint_pending:
+            self.paint_pending[job.name] = (job, time.perf_counter())
+
+
+    def record_timing(self, job):
+        """Kept once the rows have painted, so the history has every step"""
+        pending = self.paint_pending.get(job.name)
+        if pending and pending[0] is job:
+            self.timing_pending[job.name] = job
+        else:
+            self.add_timing(job.timing)
+
+
+    def record_timing_pending(self, name):
+        job = self.timing_pending.pop(name, None)
+        if job is not None:
+            self.add_timing(job.timing)
+
+
+    def eventFilter(self, obj, event):
+        if event.type() == QEvent.Paint and obj in self.viewports:
+            name = self.viewports[obj]
+            if name in self.paint_pending:
+                job, started = self.paint_pending.pop(name)
+                job.timing.add('paint', time.perf_counter() - started)
+                self.record_timing_pending(name)
+                self.show_timing()
+
+        return super().eventFilter(obj, event)
+
+
+    def update_table_model(self, job):
+        started = time.perf_counter()
+        table_model = self.result_sets[job.name]
+
+        if job.truncated:
+            self.log_line('-- %s truncated at %d MB' % (
+                job.name,
+                self.state.result_memory_limit_mb
+            ))
+
+        # Streamed rows are already in the model, there are no more coming
+        if table_model.job_id == job.id and not job.is_error:
+            table_model.append_rows([])
+            self.cache_result(job, table_model)
+            self.record_timing(job)
+            self.result_loaded(job.name)
+            return None
+
+        table_model.reset(job.headers, job.record_set, job.is_error, job.id)
+        self.time_model(job, started)
+        self.record_timing(job)
+        self.result_loaded(job.name)
+
+
+    def result_loaded(self, name):
+        if name != 'data':
+            return None
+
+        self.preview_loaded = True
+        if self.pager:
+            self.data_page_loaded()
+
+
+    def stream_table_model(self, job, rows, has_more):
+        started = time.perf_counter()
+        table_model = self.result_sets[job.name]
+        fetch_more = (lambda: self.executor.fetch_more(job)) if has_more else None
+
+        if table_model.job_id != job.id:
+            table_model.reset(job.headers, [], job_id=job.id)
+
+        table_model.append_rows(rows, fetch_more)
+        self.time_model(job, started)
+
+
+    def cache_result(self, job, table_model):
+        cacheable = (
+            self.state.result_cache and
+            job.complete and
+            result_cache.is_read_only(job.sql) and
+            isinstance(table_model.record_set, ColumnarResultSet)
         )
 
-        table_model.update_emit()
+        if cacheable:
+            self.result_cache.put(
+                self.result_cache.key(job.connection['name'], job.ran_in, job.sql),
+                job.headers,
+                table_model.record_set
+            )
+
+
+    def cached_result(self, connection, sql, name):
+        """
+        Keyed on the database the tab's session is using, which a typed USE
+        may have moved away from the tree's. Not looked up while the tab
+        still has a job to run, as that may be a USE
+        """
+        if not self.state.result_cache:
+            return None
+
+        if not result_cache.is_read_only(sql):
+            self.result_cache.invalidate_for(connection['name'], sql)
+            return None
+
+        if self.executor.state(name) in (QueryJob.state_queued, QueryJob.state_running):
+            return None
+
+        return self.result_cache.get(self.result_cache.key(
+            connection['name'],
+            self.executor.database_for(connection, name, connection['database']),
+            sql
+        ))
+
+
+    def execute_update_table_model(self, name, sql, batch_size=None):
+        table_model = self.result_sets[name]
+        self.cache_hits.pop(name, None)
+        self.tab_sql[name] = sql
+
+        try:
+            connection = self.connections.check_active_connection()
+            entry = self.cached_result(connection, sql, name)
+
+            if entry:
+                self.executor.forget(name)
+                self.cache_hits[name] = entry
+                table_model.reset(entry.headers, entry.result_set)
+                self.show_job_state(None, name)
+                self.result_loaded(name)
+                sql = '-- cached\n' + sql
+            else:
+                self.executor.submit(
+                    name,
+                    sql,
+                    connection,
+                    connection['database'],
+                    batch_size=batch_size
+                )
+        except DatabaseException as e:
+            table_model.reset(['Error'], [[str(e)]], True)
+
+        self.log_line(sql)
 
 
     def highlight_log(self, new_index):
         if new_index == 2:
-            self.text_edit_log_document.setHtml(
-            syntax_highlighter.highlight(
-                self.text_edit_log.toPlainText(),
-                self.formatter_log
-            )
-        )
+            self.log_pane.flush()
 
 
     def setup_diagram(self):
@@ -150,6 +497,134 @@ class MainWindow(QMainWindow, WindowMixin):
         }
 
 
+    def setup_history(self):
+        self.history_model = QStandardItemModel(self)
+        self.table_view_history.setModel(self.history_model)
+        self.table_view_history.horizontalHeader().setStretchLastSection(True)
+        self.table_view_history.verticalHeader().hide()
+
+        # Searched once typing pauses rather than on every key
+        self.history_search_timer = QTimer(self)
+        self.history_search_timer.setSingleShot(True)
+        self.history_search_timer.setInterval(150)
+        self.history_search_timer.timeout.connect(self.search_history)
+
+        self.line_edit_history_search.textChanged.connect(
+            self.history_search_timer.start
+        )
+        self.history_this_connection.toggled.connect(self.search_history)
+        self.history_errors.toggled.connect(self.search_history)
+        self.history_slowest.toggled.connect(self.search_history)
+        self.table_view_history.doubleClicked.connect(self.run_history)
+        self.history_run.clicked.connect(self.run_history)
+        self.history_edit.clicked.connect(self.edit_history)
+        self.table_query.currentChanged.connect(lambda new_index:
+            self.search_history()
+            if self.table_query.widget(new_index) is self.tab_history
+            else None
+        )
+
+
+    def search_history(self):
+        connection = None
+        if self.history_this_connection.isChecked():
+            connection = (self.connections.active_connection or {}).get('name')
+
+        limit = 1000
+        errors = True if self.history_errors.isChecked() else None
+        if self.history_slowest.isChecked():
+            self.history_entries = self.slowest_timings(connection, errors, limit)
+            total = len(self.timings)
+        else:
+            self.history_entries = self.history.search(
+                self.line_edit_history_search.text(),
+                connection,
+                errors,
+                limit
+            )
+            total = self.history.count()
+
+        model = self.history_model
+        model.clear()
+        model.setHorizontalHeaderLabels(
+            ['When', 'Connection', 'Database', 'Time', 'Rows', 'SQL']
+        )
+
+        for entry in self.history_entries:
+            sql = ' '.join(entry.sql.split())
+            items = [
+                QStandardItem(datetime.fromtimestamp(entry.at).strftime('%Y-%m-%d %H:%M:%S')),
+                QStandardItem(entry.connection or ''),
+                QStandardItem(entry.database or ''),
+                QStandardItem(format_seconds(entry.seconds or 0)),
+                QStandardItem('{:,}'.format(entry.rows or 0)),
+                QStandardItem(sql[:500]),
+            ]
+            items[-1].setToolTip(entry.sql if not entry.error
+                else '%s\n\n%s' % (entry.sql, entry.error))
+            if entry.timing is not None:
+                items[3].setToolTip(entry.timing.describe())
+
+            for item in items[3:5]:
+                item.setTextAlignment(Qt.AlignRight + Qt.AlignVCenter)
+
+            if entry.error:
+                for item in items:
+                    item.setForeground(QColor(Qt.red))
+
+            model.appendRow(items)
+
+        self.table_view_history.resizeColumnsToContents()
+        self.label_history_count.setText('%s of %s statements' % (
+            '{:,}'.format(len(self.history_entries)),
+            '{:,}'.format(total)
+        ) + (' (%s %d shown)' % (
+            'slowest' if self.history_slowest.isChecked() else 'newest',
+            limit
+        ) if len(self.history_entries) == limit else ''))
+
+
+    def slowest_timings(self, connection, errors, limit):
+        """The statements run since opening, slowest first, as history entries"""
+        found = self.timings.find(
+            sql=self.line_edit_history_search.text().strip() or None,
+            connection=connection,
+            errors=errors
+        )
+        return [
+            HistoryEntry(None, timing.at, timing.name, timing.connection,
+                timing.database, timing.sql, timing.total, timing.rows,
+                timing.error, timing)
+            for timing in found.slowest(limit)
+        ]
+
+
+    def selected_history(self):
+        rows = self.table_view_history.selectionModel().selectedRows()
+        if not rows:
+            return None
+
+        return self.history_entries[rows[0].row()]
+
+
+    def run_history(self):
+        entry = self.selected_history()
+        if entry:
+            self.execute_update_table_model('result_set_1', entry.sql)
+            self.show_record_set(self.tab_index_from_name('result_set_1'))
+
+
+    def edit_history(self):
+        entry = self.selected_history()
+        if entry:
+            cursor = self.text_edit_sql.textCursor()
+            cursor.movePosition(QTextCursor.End)
+            text = entry.sql if entry.sql.rstrip().endswith(';') else entry.sql + ';'
+            cursor.insertText(('\n' if self.text_edit_sql.toPlainText() else '') + text)
+            self.text_edit_sql.setTextCursor(cursor)
+            self.table_query.setCurrentWidget(self.tab_editor)
+
+
     def show_diagram(self, new_index):
         if new_index != 1:
             return None
@@ -231,7 +706,8 @@ class MainWindow(QMainWindow, WindowMixin):
             self.select_sql_fragment(*start_end_points)
 
 
-    def execute(self, result_set_index):
+    def sql_fragment(self):
+        """The selected SQL or else the query around the cursor"""
         doc = self.text_edit_sql.document()
         text_cursor = self.text_edit_sql.textCursor()
 
@@ -254,14 +730,325 @@ class MainWindow(QMainWindow, WindowMixin):
             if sql_fragment:
                 self.select_sql_fragment(*start_end_points)
 
+        return sql_fragment
+
+
+    def execute(self, result_set_index):
+        sql_fragment = self.sql_fragment()
         if sql_fragment:
             result_set_name = 'result_set_' + str(result_set_index + 1)
             tab_index = 2 + result_set_index
-            table_model = self.result_sets[result_set_name]
-            self.execute_update_table_model(table_model, sql_fragment)
+            if self.state.limit_guard and explain.is_unbounded_select(sql_fragment):
+                self.guard_limit(result_set_name, sql_fragment)
+            else:
+                self.guarded = None
+                self.execute_update_table_model(result_set_name, sql_fragment)
             self.show_record_set(tab_index)
 
 
+    def guard_limit(self, name, sql):
+        """
+        Asks the server how many rows a SELECT without a LIMIT would give,
+        it is run once the estimate is back. Only the latest one is run
+        """
+        guarded = (name, sql)
+        self.guarded = guarded
+
+        def finished(job):
+            if self.guarded is not guarded:
+                return None
+
+            self.guarded = None
+            estimate = None
+            if not job.is_error:
+                estimate = explain.estimate_rows(job.headers, job.record_set)
+
+            if estimate is None or estimate <= self.state.limit_guard_rows:
+                self.execute_update_table_model(name, sql)
+                return None
+
+            limit = self.state.limit_guard_limit
+            if self.state.limit_guard_ask:
+                answer = QMessageBox.question(
+                    self,
+                    'Large Result',
+                    'The server estimates about %s rows.\n\n'
+                    'Yes adds LIMIT %s, No runs it as it is' % (
+                        '{:,}'.format(estimate),
+                        '{:,}'.format(limit)
+                    ),
+                    QMessageBox.Yes | QMessageBox.No | QMessageBox.Cancel,
+                    QMessageBox.Yes
+                )
+
+                if answer == QMessageBox.Cancel:
+                    return None
+
+                if answer == QMessageBox.No:
+                    self.execute_update_table_model(name, sql)
+                    return None
+
+            self.log_line('-- estimated ~%s rows, LIMIT %d added' % (
+                format_count(estimate),
+                limit
+            ))
+            self.execute_update_table_model(name, explain.with_limit(sql, limit))
+
+        self.run_internal('limit_guard', 'EXPLAIN ' + explain.strip_semicolon(sql), finished)
+
+
+    def current_tab_sql(self):
+        """The current tab's query, for the Data tab the whole table"""
+        name = self.tab_name_from_index(self.tab_result_sets.currentIndex())
+        if name == 'data' and self.pager:
+            return self.pager.export_sql()
+
+        return self.tab_sql.get(name)
+
+
+    def export_results(self):
+        """
+        The current tab's query is run again on a session of it's own
+        and the rows written to a file as they arrive. For the Data tab
+        that is the whole table, not just the page
+        """
+        sql = self.current_tab_sql()
+        if not sql:
+            return None
+
+        try:
+            connection = self.connections.check_active_connection()
+        except DatabaseException as e:
+            show_connection_error(str(e))
+            return None
+
+        path, file_filter = QFileDialog.getSaveFileName(
+            self,
+            'Export Results',
+            '',
+            export.file_filters()
+        )
+
+        if not path:
+            return None
+
+        path, file_format, compress = export.format_from_path(path, file_filter)
+
+        self.log_line('-- export to %s\n%s' % (path, sql))
+        self.export_dialog.start(path)
+        self.executor.submit_export(
+            'export',
+            sql,
+            connection,
+            connection['database'],
+            path,
+            file_format,
+            compress,
+            on_progress=self.export_dialog.progress,
+            on_finished=self.export_finished
+        )
+
+
+    def export_finished(self, job):
+        self.add_timing(job.timing)
+        self.export_dialog.finish(job)
+
+
+    def profile_columns(self):
+        """
+        Like an export, the query is run again and every row read,
+        however many there are, but into a profile of each column
+        """
+        sql = self.current_tab_sql()
+        if not sql:
+            return None
+
+        try:
+            connection = self.connections.check_active_connection()
+        except DatabaseException as e:
+            show_connection_error(str(e))
+            return None
+
+        self.log_line('-- profile\n' + sql)
+        self.profile_dialog.start(sql)
+        self.executor.submit_profile(
+            'profile',
+            sql,
+            connection,
+            connection['database'],
+            on_progress=self.profile_dialog.progress,
+            on_finished=self.profile_finished
+        )
+
+
+    def profile_finished(self, job):
+        self.add_timing(job.timing)
+        self.profile_dialog.finish(job)
+
+
+    def compare_results(self):
+        """The current tab against the next one by default"""
+        names = ['data', 'result_set_1', 'result_set_2', 'result_set_3']
+        tabs = [(name, self.tab_result_sets.tabText(self.tab_index_from_name(name)))
+            for name in names]
+
+        old_name = self.tab_name_from_index(self.tab_result_sets.currentIndex())
+        if old_name not in names:
+            old_name = names[1]
+
+        new_name = names[(names.index(old_name) + 1) % len(names)]
+        self.diff_dialog.prepare(tabs, old_name, new_name)
+
+
+    def start_diff(self, old_name, new_name, key_text):
+        old_model = self.result_sets[old_name]
+        new_model = self.result_sets[new_name]
+        if old_name == new_name:
+            self.diff_dialog.error('Pick two different tabs')
+            return None
+
+        for model in [old_model, new_model]:
+            if model.record_set is None or model.is_error:
+                self.diff_dialog.error('Both tabs need results to compare')
+                return None
+
+        try:
+            result_diff = diff.ResultDiff(
+                old_model.headers,
+                old_model.record_set,
+                new_model.headers,
+                new_model.record_set,
+                diff.parse_key_columns(key_text)
+            )
+        except ValueError as e:
+            self.diff_dialog.error(str(e))
+            return None
+
+        self.stop_diff()
+        self.result_diff = result_diff
+        old_model.set_diff_marks(result_diff.old_marks)
+        new_model.set_diff_marks(result_diff.new_marks)
+        self.diff_models = (old_model, new_model)
+        self.diff_dialog.start(result_diff)
+        QTimer.singleShot(0, lambda: self.diff_step(result_diff))
+
+
+    def diff_step(self, result_diff):
+        """
+        A step at a time from the event loop so the counts and colours
+        show as they are found. A tab getting a new result clears it's
+        marks, which stops the diff
+        """
+        if result_diff is not self.result_diff:
+            return None
+
+        old_model, new_model = self.diff_models
+        if (old_model.diff_marks is not result_diff.old_marks
+                or new_model.diff_marks is not result_diff.new_marks):
+            self.stop_diff()
+            return None
+
+        finished = result_diff.step()
+        old_model.update_emit()
+        new_model.update_emit()
+
+        if not finished:
+            self.diff_dialog.progress(result_diff)
+            QTimer.singleShot(0, lambda: self.diff_step(result_diff))
+            return None
+
+        self.result_diff = None
+        self.diff_dialog.finish(result_diff)
+        self.log_line('-- compared %s rows in %s: %s' % (
+            '{:,}'.format(result_diff.total),
+            format_seconds(result_diff.seconds),
+            result_diff.summary()
+        ))
+
+
+    def stop_diff(self):
+        if self.result_diff is not None:
+            self.diff_dialog.finish(self.result_diff)
+            self.result_diff = None
+
+
+    def explain(self):
+        sql_fragment = self.sql_fragment()
+        if not sql_fragment:
+            return None
+
+        try:
+            connection = self.connections.check_active_connection()
+        except DatabaseException as e:
+            show_connection_error(str(e))
+            return None
+
+        self.plan_dialog.explain(sql_fragment, connection['pool'])
+
+
+    def run_script(self):
+        text_cursor = self.text_edit_sql.textCursor()
+        script = text_cursor.selectedText().replace('\u2029', '\n')
+        if not script.strip():
+            script = self.text_edit_sql.toPlainText()
+
+        statements = split_sql_statements(script)
+        if not statements:
+            return None
+
+        try:
+            connection = self.connections.check_active_connection()
+        except DatabaseException as e:
+            show_connection_error(str(e))
+            return None
+
+        def statement_finished(job, result):
+            self.log_line(result.sql)
+            self.add_timing(result.timing)
+            self.result_cache.invalidate_for(job.connection['name'], result.sql)
+            self.script_dialog.add_result(result)
+
+        def finished(job):
+            self.script_dialog.finish(job)
+
+        continue_on_error = self.script_dialog.continue_on_error.isChecked()
+        self.state.script_continue_on_error = continue_on_error
+
+        self.script_dialog.start(len(statements))
+        self.executor.submit_script(
+            'script',
+            statements,
+            connection,
+            connection['database'],
+            continue_on_error,
+            statement_finished,
+            finished
+        )
+
+
+    def run_internal(self, name, sql, on_finished):
+        """Run SQL that isn't for a result set tab, such as an EXPLAIN"""
+        try:
+            connection = self.connections.check_active_connection()
+        except DatabaseException as e:
+            show_connection_error(str(e))
+            return None
+
+        def finished(job):
+            self.add_timing(job.timing)
+            on_finished(job)
+
+        self.log_line(sql)
+        return self.executor.submit(
+            name,
+            sql,
+            connection,
+            connection['database'],
+            collect=True,
+            on_finished=finished
+        )
+
+
     def show_record_set(self, tab_index):
         self.tab_result_sets.setCurrentIndex(tab_index)
         self.text_edit_sql.setFocus()
@@ -297,23 +1084,49 @@ class MainWindow(QMainWindow, WindowMixin):
 
 
     def show_table(self, table_name, show_schema = False):
-        max_records = 1000
+        page_size = 1000
         table_name_clean = repr(table_name)[1:-1]
 
         self.execute_update_table_model(
-            self.result_sets['schema'],
+            'schema',
             "DESCRIBE %s" % table_name_clean
         )
 
-        self.execute_update_table_model(
-            self.result_sets['data'],
-            "SELECT * FROM %s LIMIT %d" % (table_name_clean, max_records)
+        self.pager = None
+        self.prefetched = None
+        self.preview_loaded = False
+        self.data_order = None
+        self.data_filters = []
+        self.table_view_data.horizontalHeader().clear_filters()
+        self.table_view_data.horizontalHeader().setSortIndicator(-1, Qt.AscendingOrder)
+        self.executor.forget('data_prefetch')
+        self.update_paging()
+        self.set_tab_title('data', 'Data: %s' % table_name)
+
+        # The schema and its keys are read on one session while the first
+        # rows are read on another. If those rows turn out to be in key
+        # order they are the first page, otherwise it is read again.
+        # SELECT * would read long text and binary columns whole, so that
+        # is only done for tables known not to have any, other tables wait
+        # for DESCRIBE and read the first page with those cut short
+        self.paged_table_name = table_name
+        columns = self.table_columns.get(self.paged_table_key())
+        preview = columns is not None and not columns[1]
+
+        self.run_internal(
+            'data_keys',
+            "SHOW KEYS FROM %s" % table_name_clean,
+            lambda job: self.start_paging(table_name, job, page_size, preview)
         )
 
-        self.tab_result_sets.setTabText(0, 'Data: %s (%d)' % (
-            table_name,
-            max_records
-        ))
+        if preview:
+            self.execute_update_table_model(
+                'data',
+                "SELECT * FROM %s LIMIT %d" % (table_name_clean, page_size),
+                page_size + 1
+            )
+        else:
+            self.executor.forget('data')
 
         if show_schema:
             self.tab_result_sets.setCurrentIndex(1)
@@ -321,15 +1134,312 @@ class MainWindow(QMainWindow, WindowMixin):
             self.tab_result_sets.setCurrentIndex(0)
 
 
+    def start_paging(self, table_name, job, page_size, preview):
+        """Page by the table's key, if SHOW KEYS failed page by offset"""
+        key = [] if job.is_error else key_columns(job.record_set)
+        self.pager = KeysetPager(
+            repr(table_name)[1:-1],
+            key,
+            page_size,
+            self.data_order,
+            self.data_filters
+        )
+        self.paged_table_name = table_name
+
+        # DESCRIBE ran first on the same session, so the Schema tab has it
+        schema = self.result_sets['schema']
+        if not schema.is_error and schema.record_set is not None:
+            self.pager.columns, self.pager.prefixed = long_columns(
+                schema.headers,
+                schema.record_set.rows()
+            )
+            if self.pager.columns:
+                self.table_columns[self.paged_table_key()] = (
+                    self.pager.columns,
+                    self.pager.prefixed
+                )
+
+        self.update_paging()
+
+        if not preview:
+            self.pager.previewing = False
+            self.show_page(0)
+        elif self.preview_loaded:
+            self.data_page_loaded()
+
+
+    def show_page(self, page_no):
+        pager = self.pager
+        if not pager:
+            return None
+
+        pager.page_no = page_no
+        self.update_paging()
+
+        prefetched = self.prefetched
+        self.prefetched = None
+        if prefetched and prefetched[:2] == (pager, page_no):
+            job = prefetched[2]
+            self.cache_hits.pop('data', None)
+            self.result_sets['data'].reset(job.headers, job.record_set)
+            self.log_line('-- prefetched\n' + job.sql)
+            self.data_page_loaded()
+            return None
+
+        self.executor.forget('data_prefetch')
+
+        # In one batch so the page is complete, and can be cached
+        self.execute_update_table_model(
+            'data',
+            pager.sql(page_no),
+            pager.page_size + 1
+        )
+
+
+    def data_page_loaded(self):
+        pager = self.pager
+        table_model = self.result_sets['data']
+        if table_model.is_error:
+            return None
+
+        if pager.previewing:
+            pager.previewing = False
+            if not pager.in_key_order(table_model.headers, table_model.record_set):
+                self.show_page(0)
+                return None
+
+        pager.loaded(pager.page_no, table_model.headers, table_model.record_set)
+        self.update_paging()
+
+        if pager.has_next():
+            self.prefetch_page(pager, pager.page_no + 1)
+
+
+    def prefetch_page(self, pager, page_no):
+        def finished(job):
+            if pager is self.pager and not job.is_error:
+                self.prefetched = (pager, page_no, job)
+
+        self.run_internal('data_prefetch', pager.sql(page_no), finished)
+
+
+    def update_paging(self):
+        pager = self.pager
+        self.previous_page.setEnabled(bool(pager) and pager.has_previous())
+        self.count_rows.setEnabled(bool(pager))
+        self.next_page.setEnabled(bool(pager) and pager.has_next())
+
+        if not pager:
+            self.label_page.setText('')
+            return None
+
+        rows = len(self.result_sets['data'].record_set or [])
+        first = pager.first_row()
+        text = 'Rows %d - %d' % (first, first + rows - 1) if rows else 'No rows'
+
+        size = self.table_sizes.get(self.paged_table_key())
+        if size and rows and not pager.filters:
+            text+= ' of %s' % size_count(size)
+
+        if not pager.is_keyset:
+            text+= ' (no key, paging by offset)'
+
+        self.label_page.setText(text)
+
+        self.set_tab_title('data', 'Data: %s (page %d)' % (
+            self.paged_table_name,
+            pager.page_no + 1
+        ))
+
+
+    def sort_data(self, col):
+        table_model = self.result_sets['data']
+        if not self.pager or table_model.is_error:
+            return None
+
+        column = table_model.headers[col]
+        descending = self.data_order == (column, False)
+        self.data_order = (column, descending)
+        self.table_view_data.horizontalHeader().setSortIndicator(
+            col,
+            Qt.DescendingOrder if descending else Qt.AscendingOrder
+        )
+        self.restart_paging()
+
+
+    def filter_data(self, header):
+        self.data_filters = [filter_sql(name, text)
+            for col, name, text in header.filters()]
+        self.restart_paging()
+
+
+    def restart_paging(self):
+        if not self.pager:
+            return None
+
+        pager = KeysetPager(
+            self.pager.table,
+            self.pager.key,
+            self.pager.page_size,
+            self.data_order,
+            self.data_filters
+        )
+        pager.columns = self.pager.columns
+        pager.prefixed = self.pager.prefixed
+        pager.previewing = False
+        self.pager = pager
+        self.prefetched = None
+        self.show_page(0)
+
+
+    def sort_results(self, name, col):
+        """Shift click to sort by more than one column"""
+        if not self.state.client_side_results:
+            return None
+
+        proxy_model = self.proxy_models[name]
+        keys = list(proxy_model.sort_keys)
+        columns = [key[0] for key in keys]
+
+        if QApplication.keyboardModifiers() & Qt.ShiftModifier and keys:
+            if col in columns:
+                i = columns.index(col)
+                keys[i] = (col, not keys[i][1])
+            else:
+                keys.append((col, False))
+        else:
+            keys = [(col, keys == [(col, False)])]
+
+        self.f('table_view_' + name).horizontalHeader().setSortIndicator(
+            keys[0][0],
+            Qt.DescendingOrder if keys[0][1] else Qt.AscendingOrder
+        )
+        proxy_model.sort_by(keys)
+
+
+    def log_proxy_time(self, done, rows, seconds):
+        self.log_line('-- %s %d rows in %s' % (done, rows, format_seconds(seconds)))
+
+
+    def toggle_client_side_results(self, checked):
+        self.state.client_side_results = checked
+        self.update_client_side_results()
+
+
+    def update_client_side_results(self):
+        checked = self.state.client_side_results
+        for name, proxy_model in self.proxy_models.items():
+            table_view = self.f('table_view_' + name)
+            table_view.setModel(proxy_model if checked else self.result_sets[name])
+            table_view.horizontalHeader().set_filtering(checked)
+            table_view.horizontalHeader().setSortIndicatorShown(checked)
+
+            if not checked:
+                proxy_model.filters = {}
+                proxy_model.sort_by([])
+
+
+    def paged_table_key(self):
+        connection = self.connections.active_connection or {}
+        return (
+            connection.get('name'),
+            connection.get('database'),
+            self.paged_table_name
+        )
+
+
+    def load_table_sizes(self, names):
+        """Estimates from the table statistics, an exact count is a full scan"""
+        connection, database = names['connection'], names['database']
+
+        self.run_internal(
+            'table_sizes',
+            """SELECT TABLE_NAME, TABLE_ROWS, DATA_LENGTH, INDEX_LENGTH
+                FROM information_schema.TABLES
+                WHERE TABLE_SCHEMA = %s""" % sql_literal(database),
+            lambda job: self.table_sizes_loaded(connection, database, job)
+        )
+
+
+    def table_sizes_loaded(self, connection, database, job):
+        if job.is_error:
+            return None
+
+        for name, rows, data_length, index_length in job.record_set:
+            if isinstance(name, (bytes, bytearray)):
+                name = name.decode('utf-8')
+
+            key = (connection, database, name)
+            size = self.table_sizes.get(key, {'exact': False})
+            size.update({
+                'data'  : int(data_length or 0),
+                'index' : int(index_length or 0),
+            })
+
+            if not size['exact']:
+                size['rows'] = int(rows or 0)
+
+            self.table_sizes[key] = size
+            self.show_table_size(key)
+
+        self.update_paging()
+
+
+    def show_table_size(self, key):
+        size = self.table_sizes[key]
+        tool_tip = '%s rows%s, data %s, indexes %s' % (
+            '{:,}'.format(size['rows']),
+            '' if size['exact'] else ' (estimate)',
+            format_bytes(size['data']),
+            format_bytes(size['index'])
+        )
+
+        self.connections.set_table_note(*key, size_count(size), tool_tip)
+
+
+    def count_rows_clicked(self):
+        """Start an exact count, or cancel the one running"""
+        if self.executor.state('exact_count') not in (None, 'done'):
+            self.executor.kill('exact_count')
+            return None
+
+        if not self.pager:
+            return None
+
+        key = self.paged_table_key()
+        job = self.run_internal(
+            'exact_count',
+            'SELECT COUNT(*) FROM %s' % self.pager.table,
+            lambda job: self.rows_counted(key, job)
+        )
+
+        if job:
+            self.count_rows.setText('Cancel count')
+
+
+    def rows_counted(self, key, job):
+        self.count_rows.setText('Count')
+
+        if job.is_error:
+            self.log_line('-- count %s' % (
+                'cancelled' if job.cancelled else 'failed: ' + job.record_set[0][0]
+            ))
+            return None
+
+        size = self.table_sizes.get(key, {'data': 0, 'index': 0})
+        size['rows'] = int(job.record_set[0][0])
+        size['exact'] = True
+        self.table_sizes[key] = size
+        self.show_table_size(key)
+        self.update_paging()
+
+
     def show_table_schema(self, table_name):
         self.show_table(table_name, True)
 
 
     def error_handler(self, errors):
-        self.result_sets['data'].headers = ['Error']
-        self.result_sets['data'].record_set = errors
-        self.result_sets['data'].is_error = True
-        self.result_sets['data'].update_emit()
+        self.result_sets['data'].reset(['Error'], errors, True)
         self.show_record_set(0)
 
 
@@ -346,6 +1456,12 @@ class MainWindow(QMainWindow, WindowMixin):
             self.state.connections,
             self.tree_view_objects
         )
+        self.connections.pool_options = {
+            'min_size'     : self.state.pool_min_size,
+            'max_size'     : self.state.pool_max_size,
+            'idle_seconds' : self.state.pool_idle_seconds,
+            'max_pinned'   : self.state.pool_max_pinned
+        }
 
         self.connections.is_dark = self.is_dark
         self.connections.bind('focus_changed', lambda names: self.tree_select_changed(**names))
@@ -353,6 +1469,7 @@ class MainWindow(QMainWindow, WindowMixin):
         #self.connections.bind('connection_changed', self.f('connection_indicator').setText)
         #self.connections.bind('database_changed', self.f('db_name').setText)
         self.connections.bind('errors', self.error_handler)
+        self.connections.bind('tables_listed', self.load_table_sizes)
 
         index = self.state.active_connection_index
         if index is not None and index >= len(self.state.connections):
@@ -368,15 +1485,88 @@ class MainWindow(QMainWindow, WindowMixin):
 
     def tree_context_menu(self, pos):
         index = self.tree_view_objects.indexAt(pos)
-        if index.parent().isValid():
+        index = index.sibling(index.row(), 0)
+        if not index.isValid():
+            return None
+
+        level = item_type_from_index(index)
+        if level == 'database':
             return None
 
         self.last_tree_model_index = index
-        self.extra_ui.get_menu_action('tree_connection').exec_(QCursor.pos())
+        self.extra_ui.get_menu_action('tree_' + level).exec_(QCursor.pos())
+
+
+    def import_csv(self):
+        """Into the table the tree's menu was opened on"""
+        names = find_connection_database_table_from_index(self.last_tree_model_index)
+        index = self.connections.list_index_from_name(names['connection'])
+        if index is None or self.connections[index].get('broken'):
+            show_connection_error('No connection')
+            return None
+
+        path, file_filter = QFileDialog.getOpenFileName(
+            self,
+            'Import CSV into %s' % names['table'],
+            '',
+            'CSV (*.csv *.csv.gz *.txt);;All files (*)'
+        )
+
+        if not path:
+            return None
+
+        self.import_target = (self.connections[index], names['database'], names['table'], path)
+        self.import_dialog.prepare(
+            path,
+            '%s.%s' % (names['database'], names['table']),
+            self.state.import_load_data,
+            self.state.import_chunk_size,
+            self.state.import_disable_checks
+        )
+
+
+    def start_import(self, load_data, chunk_size, disable_checks):
+        connection, database, table, path = self.import_target
+        self.state.import_load_data = load_data
+        self.state.import_chunk_size = chunk_size
+        self.state.import_disable_checks = disable_checks
+
+        self.log_line('-- import %s into %s.%s' % (path, database, table))
+        self.import_dialog.start()
+        self.executor.submit_import(
+            'import',
+            connection,
+            database,
+            path,
+            quote_identifier(table),
+            chunk_size,
+            load_data,
+            disable_checks,
+            on_progress=self.import_dialog.progress,
+            on_finished=self.import_finished
+        )
+
+
+    def import_finished(self, job):
+        self.add_timing(job.timing)
+        self.import_dialog.finish(job)
+        self.result_cache.invalidate(job.connection['name'])
 
 
     def setup_state(self):
         self.state = load_state()
+        self.script_dialog.continue_on_error.setChecked(
+            self.state.script_continue_on_error
+        )
+        self.action_large_result_mode.setChecked(self.state.large_result_mode)
+        self.update_executor_options()
+        self.action_result_cache.setChecked(self.state.result_cache)
+        self.update_result_cache_options()
+        self.action_client_side_results.setChecked(self.state.client_side_results)
+        self.update_client_side_results()
+        self.action_limit_guard.setChecked(self.state.limit_guard)
+        self.action_limit_guard_ask.setChecked(self.state.limit_guard_ask)
+
         self.setup_connections()
 
         self.text_editor.plain_text = self.state.editor_sql
@@ -420,6 +1610,7 @@ class MainWindow(QMainWindow, WindowMixin):
 
     def copy_name(self):
         index = self.tree_view_objects.currentIndex()
+        index = index.sibling(index.row(), 0)
         QApplication.instance().clipboard().setText(index.data())
 
 
@@ -435,24 +1626,125 @@ class MainWindow(QMainWindow, WindowMixin):
         window.menu('action_copy' + s, self.text_editor.q_text.copy)
         window.menu('action_paste' + s, self.text_editor.q_text.paste)
         window.menu('action_select_query' + s, self.select_query)
+        window.menu('action_explain' + s, self.explain)
+        window.menu('action_run_script' + s, self.run_script)
         window.menu('action_select_all' + s, self.text_editor.q_text.selectAll)
         window.menu('action_text_size_increase' + s, e.font_point_size_increase)
         window.menu('action_text_size_decrease' + s, e.font_point_size_decrease)
         window.menu('action_font' + s, self.show_font_choice)
+        window.menu('action_large_result_mode' + s, self.toggle_large_result_mode)
+        window.menu('action_result_memory_limit' + s, self.show_result_memory_limit_choice)
+        window.menu('action_result_cache' + s, self.toggle_result_cache)
+        window.menu('action_clear_result_cache' + s, self.clear_result_cache)
+        window.menu('action_client_side_results' + s, self.toggle_client_side_results)
+        window.menu('action_limit_guard' + s, self.toggle_limit_guard)
+        window.menu('action_limit_guard_ask' + s, self.toggle_limit_guard_ask)
+        window.menu('action_limit_guard_options' + s, self.show_limit_guard_choice)
         window.menu('action_quit' + s, self.quit)
         window.menu('action_copy_cell' + s, self.copy_cell)
+        window.menu('action_view_value' + s, self.view_value)
+        window.menu('action_export' + s, self.export_results)
+        window.menu('action_import_csv' + s, self.import_csv)
+        window.menu('action_compare_results' + s, self.compare_results)
+        window.menu('action_profile_columns' + s, self.profile_columns)
         window.menu('action_copy_item_name' + s, self.copy_name)
         window.menu('action_connection_remove' + s, self.remove_connection)
-        window.menu('action_refresh' + s, lambda: self.connections.refresh())
+        window.menu('action_refresh' + s, self.refresh_connections)
 
         window.menu('action_help' + s, HelpDialog(window, user_config_file_path).show)
         window.menu('action_donate' + s, DonationDialog(window).show)
         window.menu('action_about' + s, AboutDialog(window).show)
 
 
+    def update_executor_options(self):
+        self.executor.raw = self.state.large_result_mode
+        self.executor.memory_limit = (
+            self.state.result_memory_limit_mb * 1024 * 1024
+        )
+
+
+    def update_result_cache_options(self):
+        self.result_cache.ttl = self.state.result_cache_ttl
+        self.result_cache.max_bytes = self.state.result_cache_mb * 1024 * 1024
+
+
+    def toggle_result_cache(self, checked):
+        self.state.result_cache = checked
+        if not checked:
+            self.clear_result_cache()
+
+
+    def clear_result_cache(self):
+        self.result_cache.invalidate()
+        self.cache_hits = {}
+        for name in self.result_sets:
+            self.show_job_state(self.executor.jobs.get(name), name)
+
+
+    def toggle_large_result_mode(self, checked):
+        self.state.large_result_mode = checked
+        self.update_executor_options()
+
+
+    def toggle_limit_guard(self, checked):
+        self.state.limit_guard = checked
+
+
+    def toggle_limit_guard_ask(self, checked):
+        self.state.limit_guard_ask = checked
+
+
+    def show_limit_guard_choice(self):
+        rows, valid = QInputDialog.getInt(
+            self,
+            'LIMIT Guard',
+            'Guard SELECTs estimated to return more rows than:',
+            self.state.limit_guard_rows,
+            1,
+            1000000000
+        )
+
+        if not valid:
+            return None
+
+        limit, valid = QInputDialog.getInt(
+            self,
+            'LIMIT Guard',
+            'Add a LIMIT of:',
+            self.state.limit_guard_limit,
+            1,
+            10000000
+        )
+
+        if valid:
+            self.state.limit_guard_rows = rows
+            self.state.limit_guard_limit = limit
+
+
+    def show_result_memory_limit_choice(self):
+        limit, valid = QInputDialog.getInt(
+            self,
+            'Result Memory Limit',
+            'Stop fetching a result set at (MB):',
+            self.state.result_memory_limit_mb,
+            1,
+            100000
+        )
+
+        if valid:
+            self.state.result_memory_limit_mb = limit
+            self.update_executor_options()
+
+
+    def refresh_connections(self):
+        self.executor.shutdown()
+        self.connections.refresh()
+
+
     def remove_connection(self):
         confirmation = show_confirm_remove_connection(self.last_tree_model_index.data())
         if confirmation == QMessageBox.Ok:
+            self.executor.close_sessions(self.last_tree_model_index.data())
             self.connections.pop(self.last_tree_model_index.row())
 
 
@@ -479,6 +1771,7 @@ class MainWindow(QMainWindow, WindowMixin):
         self.bind_menu()
         self.bind_menu(self.extra_ui, '_result_set')
         self.bind_menu(self.extra_ui, '_tree_connection')
+        self.bind_menu(self.extra_ui, '_tree_table')
 
         self.setup_result_set('result_set_1')
         self.setup_result_set('result_set_2')
@@ -486,20 +1779,22 @@ class MainWindow(QMainWindow, WindowMixin):
         self.setup_result_set('data')
         self.setup_result_set('schema')
 
-        self.formatter_log = syntax_highlighter.create_formatter(
-            self.text_edit_log.styleSheet()
-        )
-        self.text_edit_log_document = QTextDocument(self)
-        self.text_edit_log_document.setDefaultStyleSheet(
-            syntax_highlighter.style()
-        )
-        self.text_edit_log.setDocument(self.text_edit_log_document)
+        self.log_pane = LogPane(self, self.text_edit_log, syntax_highlighter)
 
         self.execute_1.clicked.connect(lambda: self.execute(0))
         self.execute_2.clicked.connect(lambda: self.execute(1))
         self.execute_3.clicked.connect(lambda: self.execute(2))
+        self.explain_query.clicked.connect(self.explain)
+        self.previous_page.clicked.connect(lambda: self.show_page(self.pager.page_no - 1))
+        self.next_page.clicked.connect(lambda: self.show_page(self.pager.page_no + 1))
+        self.count_rows.clicked.connect(self.count_rows_clicked)
+        self.label_timing = QLabel()
+        self.tab_result_sets.setCornerWidget(self.label_timing, Qt.TopRightCorner)
+        self.tab_result_sets.currentChanged.connect(lambda: self.show_timing())
+
         self.table_query.currentChanged.connect(self.highlight_log)
         self.table_query.currentChanged.connect(self.show_diagram)
+        self.setup_history()
 
 
         # Must be last
@@ -518,3 +1813,11 @@ class MainWindow(QMainWindow, WindowMixin):
         self.state.active_connection_index = self.connections.active_connection_index
 
         save_state(self.state)
+        self.executor.shutdown()
+        for name in list(self.timing_pending):
+            self.record_timing_pending(name)
+        self.history.close()
+
+
+def size_count(size):
+    return ('%s' if size['exact'] else '~%s') % format_count(size['rows'])
@@ -18,6 +18,7 @@
 
 import json, colorsys, hashlib
 import mysql.connector
+from .pool import ConnectionPool
 from PyQt5.QtWidgets import *
 from PyQt5.Qt import *
 from PyQt5.QtGui import *
@@ -58,9 +59,14 @@ class ConnectionList(list):
     def __init__(self, connections, q_tree):
         self.extend(connections)
 
+        # The second column is for notes on tables, such as their size
         self.model = QStandardItemModel()
+        self.model.setColumnCount(2)
         self.q_tree = q_tree
         self.q_tree.setModel(self.model)
+        self.q_tree.header().setStretchLastSection(False)
+        self.q_tree.header().setSectionResizeMode(0, QHeaderView.Stretch)
+        self.q_tree.header().setSectionResizeMode(1, QHeaderView.ResizeToContents)
 
         self.q_tree.clicked.connect(self.tree_click)
         self.event_bindings = {}
@@ -68,6 +74,7 @@ class ConnectionList(list):
 
         self.last_connection_item = None
         self.last_database_item = None
+        self.pool_options = {}
 
 
     @property
@@ -181,6 +188,25 @@ class ConnectionList(list):
             self.trigger('focus_changed', names)
 
 
+    def set_table_note(self, connection_name, database_name, table_name,
+            text, tool_tip=''):
+        root = self.model.invisibleRootItem()
+        for connection_item in child_items(root):
+            if connection_item.text() != connection_name:
+                continue
+
+            for database_item in child_items(connection_item):
+                if database_item.text() != database_name:
+                    continue
+
+                for row, table_item in enumerate(child_items(database_item)):
+                    note_item = database_item.child(row, 1)
+                    if table_item.text() == table_name and note_item:
+                        note_item.setText(text)
+                        note_item.setToolTip(tool_tip)
+                        table_item.setToolTip(tool_tip)
+
+
     def is_active_connection_broken(self):
         if 'broken' not in self.active_connection:
             return False
@@ -192,20 +218,33 @@ class ConnectionList(list):
         self.event_bindings[event_name] = event_callback
 
 
-    def execute_active_connection_cursor(self, sql):
+    def check_active_connection(self):
         if not self.active_connection:
             raise QueryDatabaseException('No connection')
 
         if self.active_connection['broken']:
             raise QueryDatabaseException('No connection')
 
+        return self.active_connection
+
+
+    def execute_active_connection_cursor(self, sql, database=None):
+        """
+        The rows are all fetched so the connection can go back to the pool
+        before they're used
+        """
+        connection = self.check_active_connection()
+
         try:
-            cursor = self.active_connection['db_connection'].cursor()
-            cursor.execute(sql)
+            with connection['pool'].connection(database) as pooled:
+                cursor = pooled.db.cursor()
+                cursor.execute(sql)
+                rows = cursor.fetchall() if cursor.with_rows else []
+                cursor.close()
         except mysql.connector.errors.Error as e:
             raise QueryDatabaseException(str(e))
 
-        return cursor
+        return rows
 
 
     @property
@@ -318,18 +357,26 @@ def list_databases(lst, connection_item):
 
 def list_tables(lst, database_item):
     if database_item.rowCount() == 0:
-        for x in lst.execute_active_connection_cursor('SHOW TABLES;'):
-            database_item.appendRow(TableTreeItem(name=x[0]))
+        tables = lst.execute_active_connection_cursor(
+            'SHOW TABLES;',
+            database_item.text()
+        )
+        for x in tables:
+            database_item.appendRow([TableTreeItem(name=x[0]), NoteTreeItem()])
 
         lst.q_tree.expand(database_item.index())
+        lst.trigger('tables_listed', {
+            'connection' : lst.active_connection['name'],
+            'database'   : database_item.text()
+        })
 
 
-def escape(text):
-    return json.dumps(text)[1:-1]
+def child_items(item):
+    return [item.child(row) for row in range(item.rowCount())]
 
 
-def change_database(lst, db_name):
-    lst.execute_active_connection_cursor('USE %s;' % escape(db_name))
+def escape(text):
+    return json.dumps(text)[1:-1]
 
 
 def select_connection(lst, connection_item):
@@ -362,7 +409,6 @@ def update_tree_state(lst):
             database_name = lst.active_connection['database']
             if database_name:
                 if lst.active_connection and database_name:
-                    change_database(lst, database_name)
                     for i in range(connection_item.rowCount()):
                         database_item = connection_item.child(i)
                         if database_item.text() == database_name:
@@ -384,7 +430,7 @@ def create_db_connection_error(**kwargs):
     return None
 
 def create_db_connection(**kwargs):
-    allowed = ['host', 'password', 'user', 'port']
+    allowed = ['host', 'password', 'user', 'port', 'allow_local_infile']
     new_kwargs = {k: v for k, v in kwargs.items() if k in allowed}
 
     new_kwargs['autocommit'] = True
@@ -393,11 +439,25 @@ def create_db_connection(**kwargs):
     return mysql.connector.connect(**new_kwargs)
 
 
+def create_pool(connection_data, **options):
+    return ConnectionPool(
+        lambda: create_db_connection(**connection_data),
+        **options
+    )
+
+
+def close_pool(connection_data):
+    if connection_data.get('pool'):
+        connection_data['pool'].close()
+        connection_data['pool'] = None
+
+
 def remove_connection_items(lst):
     lst.last_connection_item = None
     lst.last_database_item = None
 
     for connection_data in lst:
+        close_pool(connection_data)
         lst.model.removeRow(0)
         connection_data['should_remove'] = None
         connection_data['q_tree_item'] = None
@@ -408,6 +468,7 @@ def create_connection_items(root_node, lst, errors):
     for i, connection_data in enumerate(lst):
         name = name_from_connection_data(connection_data)
         if 'should_remove' in connection_data and connection_data['should_remove']:
+            close_pool(connection_data)
             lst.model.removeRow(i)
             continue
 
@@ -421,8 +482,10 @@ def create_connection_items(root_node, lst, errors):
         root_node.appendRow(tree_item)
         connection_data['q_tree_item'] = tree_item
 
+        connection_data['pool'] = create_pool(connection_data, **lst.pool_options)
+
         try:
-            connection_data['db_connection'] = create_db_connection(**connection_data)
+            connection_data['pool'].fill()
         except mysql.connector.errors.Error as e:
             connection_data['broken'] = True
             tree_item.status = TreeItem.status_broken
@@ -527,7 +590,18 @@ class TableTreeItem(TreeItem):
         self.font_point_size = 9
 
 
+class NoteTreeItem(QStandardItem):
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.setEditable(False)
+        self.setForeground(QColor(TreeItem.colors['normal']))
+        self.setTextAlignment(Qt.AlignRight | Qt.AlignVCenter)
+
+
 def find_connection_database_table_from_index(model_index):
+    # A click on a note is a click on what it is next to
+    model_index = model_index.sibling(model_index.row(), 0)
+
     names = {
         'table'      : None,
         'database'   : None,
@@ -0,0 +1,201 @@
+"""
+    Database Dossier - A User Interface for your databases
+    Copyright (C) 2023  Nicholas Shiell
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+
+import time
+from operator import itemgetter
+
+
+added   = 'added'
+removed = 'removed'
+changed = 'changed'
+
+
+def hashable(value):
+    if isinstance(value, bytearray):
+        return bytes(value)
+
+    if isinstance(value, set):
+        return frozenset(value)
+
+    return value
+
+
+def hashable_row(values):
+    """The values, or a copy of them that can be a dict key"""
+    try:
+        hash(values)
+        return values
+    except TypeError:
+        if isinstance(values, tuple):
+            return tuple(hashable(value) for value in values)
+
+        return hashable(values)
+
+
+def parse_key_columns(text):
+    """Column names separated by commas"""
+    return [name.strip() for name in text.split(',') if name.strip()]
+
+
+class ResultDiff:
+    """
+    The rows added, removed and changed going from the "old" result set
+    to the "new" one, compared on the columns they both have
+
+    Each old row is put in a dict, by its key columns when there are
+    some, otherwise by the whole row, then each new row is looked up in it,
+    so the work grows with the rows rather than the rows squared.
+    With keys a row whose key is found but whose values differ is changed,
+    the hashes of the values are compared first as most rows are the same.
+    Without keys a row is either found or not. Rows left in the dict
+    at the end have been removed
+
+    step() does "step_rows" rows at a time so the counts and the marks
+    can be shown as they grow. The marks are {row: (kind, columns)},
+    columns being the column numbers that differ in a changed row
+    """
+    step_rows = 20000
+
+    def __init__(self, old_headers, old, new_headers, new, keys=None):
+        names = [name for name in new_headers if name in old_headers]
+        if not names:
+            raise ValueError('The results have no columns in common')
+
+        keys = keys or []
+        for name in keys:
+            if name not in names:
+                raise ValueError('%s is not a column of both results' % name)
+
+        self.old = old
+        self.new = new
+        self.keys = keys
+        self.names = names
+        self.old_cols = [old_headers.index(name) for name in names]
+        self.new_cols = [new_headers.index(name) for name in names]
+        self.old_values = itemgetter(*self.old_cols)
+        self.new_values = itemgetter(*self.new_cols)
+        self.old_key = itemgetter(*[old_headers.index(name) for name in keys]) if keys else None
+        self.new_key = itemgetter(*[new_headers.index(name) for name in keys]) if keys else None
+
+        self.old_length = len(old)
+        self.new_length = len(new)
+        self.index = {}
+        self.old_marks = {}
+        self.new_marks = {}
+        self.counts = {added: 0, removed: 0, changed: 0}
+        self.same = 0
+        self.done = 0
+        self.started = time.perf_counter()
+        self.seconds = 0.0
+        self.finished = False
+        self.steps = self.run()
+
+
+    @property
+    def total(self):
+        return self.old_length + self.new_length
+
+
+    def step(self):
+        """Returns True once the whole diff is done"""
+        if not self.finished:
+            self.finished = next(self.steps, True)
+            self.seconds = time.perf_counter() - self.started
+
+        return self.finished
+
+
+    def run(self):
+        index = self.index
+        for start, rows in self.batches(self.old, self.old_length):
+            for i, row in enumerate(rows, start):
+                values = hashable_row(self.old_values(row))
+                key = hashable_row(self.old_key(row)) if self.keys else values
+                entry = (i, hash(values), values)
+                if key in index:
+                    index[key].append(entry)
+                else:
+                    index[key] = [entry]
+
+            yield False
+
+        # Rows with the same key are paired in order
+        for bucket in index.values():
+            if len(bucket) > 1:
+                bucket.reverse()
+
+        for start, rows in self.batches(self.new, self.new_length):
+            for i, row in enumerate(rows, start):
+                values = hashable_row(self.new_values(row))
+                key = hashable_row(self.new_key(row)) if self.keys else values
+                bucket = index.get(key)
+
+                if bucket is None:
+                    self.new_marks[i] = (added, None)
+                    self.counts[added]+= 1
+                    continue
+
+                old_row, old_hash, old_values = bucket.pop()
+                if not bucket:
+                    del index[key]
+
+                if old_hash == hash(values) and old_values == values:
+                    self.same+= 1
+                    continue
+
+                cols = self.changed_columns(old_row, values)
+                self.old_marks[old_row] = (changed, [self.old_cols[col] for col in cols])
+                self.new_marks[i] = (changed, [self.new_cols[col] for col in cols])
+                self.counts[changed]+= 1
+
+            yield False
+
+        for bucket in index.values():
+            for old_row, old_hash, old_values in bucket:
+                self.old_marks[old_row] = (removed, None)
+                self.counts[removed]+= 1
+
+        self.index = {}
+        yield True
+
+
+    def batches(self, result_set, length):
+        for start in range(0, length, self.step_rows):
+            rows = result_set.rows(start, min(start + self.step_rows, length))
+            self.done+= len(rows)
+            yield (start, rows)
+
+
+    def changed_columns(self, old_row, new_values):
+        old_values = self.old_values(self.old[old_row])
+        if len(self.names) == 1:
+            return [0]
+
+        return [col for col, (old, new) in enumerate(zip(old_values, new_values))
+            if old != new]
+
+
+    def summary(self):
+        return '%s added, %s removed, %s changed, %s the same' % tuple(
+            '{:,}'.format(count) for count in (
+                self.counts[added],
+                self.counts[removed],
+                self.counts[changed],
+                self.same
+            )
+        )
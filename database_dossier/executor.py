@@ -0,0 +1,1001 @@
+"""
+    Database Dossier - A User Interface for your databases
+    Copyright (C) 2023  Nicholas Shiell
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+
+import re, sys, csv, time, queue, threading, itertools
+import mysql.connector
+from PyQt5.QtCore import *
+from .database import create_db_connection
+from .pool import PooledConnection
+from .timings import Timing
+from .export import ExportWriter
+from .profiling import Profiler
+from . import importer
+
+
+class QueryJob:
+    """
+    One statement to be run for one result set tab
+    The state moves queued -> running -> fetching -> done
+
+    Rows are streamed, "batch_size" at a time,
+    the job stays in the fetching state while there are more rows to ask for
+
+    Once the rows fetched reach "memory_limit" bytes the stream is stopped
+    and the job is marked as truncated
+
+    Jobs that "collect" are not streamed, all the rows are in record_set
+    when they are done, they are for small internal queries
+    """
+    state_queued   = 'queued'
+    state_running  = 'running'
+    state_fetching = 'fetching'
+    state_done     = 'done'
+
+    batch_size = 500
+
+    ids = itertools.count(1)
+
+    def __init__(self, name, sql, connection, database, raw=False, memory_limit=None):
+        self.id = next(self.ids)
+        self.name = name
+        self.sql = sql
+        self.connection = connection
+        self.database = database
+        self.raw = raw
+        self.memory_limit = memory_limit
+        self.bytes = 0
+        self.truncated = False
+        self.complete = False
+        self.collect = False
+        self.cancelled = False
+        self.on_finished = None
+        self.state = self.state_queued
+        self.headers = ['Result']
+        self.record_set = [['OK']]
+        self.is_error = False
+        self.cursor = None
+        self.has_more = False
+        self.submitted = time.perf_counter()
+        self.timing = Timing(name, sql, connection.get('name'), database)
+        # The database it actually ran in, after any typed USE
+        self.ran_in = database
+
+
+    def fail(self, message):
+        self.headers = ['Error']
+        self.record_set = [[message]]
+        self.is_error = True
+        self.timing.error = message
+
+
+class ScriptJob(QueryJob):
+    """
+    Statements run one after the other on the same session
+    Each statement's result is handed back as it finishes,
+    at most "result_rows" rows are kept from each
+    """
+    result_rows = 1000
+
+    def __init__(self, name, statements, connection, database,
+            continue_on_error=False, raw=False):
+        super().__init__(name, '', connection, database, raw)
+        self.statements = statements
+        self.continue_on_error = continue_on_error
+        self.errors = 0
+        self.on_statement = None
+
+
+class ExportJob(QueryJob):
+    """
+    A statement whose rows go straight to a file, "batch_size" at a time,
+    they are never all in memory or in a TableModel
+    Progress is handed back at most every "progress_seconds"
+    """
+    batch_size = 5000
+    progress_seconds = 0.25
+
+    def __init__(self, name, sql, connection, database, path, format,
+            compress=False):
+        super().__init__(name, sql, connection, database)
+        self.path = path
+        self.format = format
+        self.compress = compress
+        self.rows = 0
+        self.on_progress = None
+
+
+class ImportJob(QueryJob):
+    """
+    Loads a CSV file into a table, with LOAD DATA LOCAL INFILE when
+    "load_data" is set and the server allows it, otherwise with INSERTs
+    of "chunk_size" rows, each chunk in a transaction of it's own
+    """
+    progress_seconds = 0.25
+
+    def __init__(self, name, connection, database, path, table,
+            chunk_size=1000, load_data=True, disable_checks=False):
+        super().__init__(name, '', connection, database)
+        # What the history shows for it, there's no one statement to show
+        self.timing.sql = '-- import %s into %s' % (path, table)
+        self.path = path
+        self.table = table
+        self.chunk_size = chunk_size
+        self.load_data = load_data
+        self.disable_checks = disable_checks
+        self.method = None
+        self.rows = 0
+        self.on_progress = None
+
+
+class ProfileJob(QueryJob):
+    """
+    A statement whose rows are read "batch_size" at a time into a Profiler
+    and dropped, so any number of rows can be profiled in one pass
+    "summary" is the profile so far, made on the worker thread before
+    each progress so the GUI never reads the Profiler as it changes
+    """
+    batch_size = 5000
+    progress_seconds = 0.5
+
+    def __init__(self, name, sql, connection, database):
+        super().__init__(name, sql, connection, database)
+        self.rows = 0
+        self.summary = []
+        self.on_progress = None
+
+
+class StatementResult:
+    def __init__(self, index, sql, timing):
+        self.index = index
+        self.sql = sql
+        self.timing = timing
+        self.headers = None
+        self.rows = None
+        self.rowcount = 0
+        self.truncated = False
+        self.seconds = 0.0
+        self.error = None
+
+
+class Session:
+    """
+    A database connection of it's own that lives on a worker thread
+    The GUI thread never touches it, so jobs can not block the window
+
+    The connection is taken from the connection's pool when a job runs
+    and given back when the session has had no job for the pool's
+    "idle_seconds", or when it stops. A "borrow" session, for short
+    internal jobs, gives it back after every job
+    """
+    def __init__(self, connection, executor, pool=None, borrow=False):
+        self.connection = connection
+        self.executor = executor
+        self.pool = pool
+        self.borrow = borrow
+        self.pooled = None
+        self.used = None
+        self.stream = None
+        self.jobs = queue.Queue()
+        self.thread = threading.Thread(target=self.work, daemon=True)
+        self.thread.start()
+
+
+    def submit(self, job):
+        self.jobs.put(job)
+
+
+    def fetch_more(self, job):
+        self.jobs.put(('fetch', job))
+
+
+    def stop(self):
+        self.jobs.put(None)
+
+
+    @property
+    def db_connection(self):
+        return self.pooled.db if self.pooled else None
+
+
+    @property
+    def database(self):
+        return self.pooled.database if self.pooled else None
+
+
+    @database.setter
+    def database(self, database):
+        if self.pooled:
+            self.pooled.database = database
+
+
+    @property
+    def round_trip(self):
+        return self.pooled.round_trip if self.pooled else 0.0
+
+
+    def connect(self):
+        """
+        A connection that has been idle is pinged first, reconnecting if
+        the server has dropped it, and the ping times the round trip
+        """
+        if self.pooled is None:
+            if self.pool is None:
+                self.pooled = PooledConnection(create_db_connection(**self.connection))
+            else:
+                self.pooled = self.pool.checkout(pinned=not self.borrow)
+        elif self.pooled.pool is not None:
+            self.pooled.pool.check(self.pooled)
+
+        self.pooled.last_used = time.perf_counter()
+
+
+    def database_for(self, database):
+        """
+        The database a job for the tree's "database" runs in. One moved to
+        with a typed USE is kept for the session's jobs until the database
+        picked in the tree is changed, as it was when the whole window
+        shared one connection
+        """
+        used = self.used
+        if used is not None and database == used[0]:
+            return used[1]
+
+        return database
+
+
+    def change_database(self, database):
+        if self.used is not None and database != self.used[0]:
+            self.used = None
+
+        self.pooled.use(self.database_for(database))
+
+
+    def record_use(self, tree_database):
+        """After a typed USE, which database the session is now using"""
+        try:
+            cursor = self.db_connection.cursor()
+            cursor.execute('SELECT DATABASE()')
+            self.database = cursor.fetchone()[0]
+            cursor.close()
+            self.used = (tree_database, self.database)
+        except mysql.connector.errors.Error:
+            self.database = None
+            self.used = None
+
+
+    def next_job(self):
+        pool = self.pooled.pool if self.pooled else None
+        if pool is None or self.stream is not None:
+            return self.jobs.get()
+
+        try:
+            return self.jobs.get(timeout=pool.idle_seconds)
+        except queue.Empty:
+            self.disconnect()
+            return self.jobs.get()
+
+
+    def work(self):
+        while True:
+            job = self.next_job()
+            if job is None:
+                self.close_stream()
+                self.disconnect()
+                break
+
+            if isinstance(job, tuple):
+                if job[1] is self.stream:
+                    self.fetch(job[1])
+                    if self.borrow and self.stream is None:
+                        self.disconnect()
+                continue
+
+            # Cancelled while it was waiting, a count or a script say
+            if job.cancelled:
+                job.fail('Cancelled')
+                self.set_state(job, job.state_done)
+                continue
+
+            # Anything else wanting the session ends the current stream
+            self.close_stream()
+            if isinstance(job, ScriptJob):
+                self.run_script(job)
+            elif isinstance(job, ExportJob):
+                self.run_export(job)
+            elif isinstance(job, ImportJob):
+                self.run_import(job)
+            elif isinstance(job, ProfileJob):
+                self.run_profile(job)
+            else:
+                self.run(job)
+
+            if self.borrow and self.stream is None:
+                self.disconnect()
+
+
+    def run(self, job):
+        started = time.perf_counter()
+        timing = job.timing
+        timing.add('queue', started - job.submitted)
+        self.set_state(job, job.state_running)
+
+        try:
+            self.connect()
+            self.change_database(job.database)
+            job.ran_in = self.database
+
+            job.cursor = self.db_connection.cursor(raw=job.raw)
+            executing = time.perf_counter()
+            timing.add('connect', executing - started)
+
+            job.cursor.execute(job.sql)
+
+            executed = time.perf_counter() - executing
+            timing.add('send', min(executed, self.round_trip / 2))
+            timing.add('server', max(0.0, executed - self.round_trip))
+
+            if job.cursor.description and job.collect:
+                self.set_state(job, job.state_fetching)
+                job.headers = [i[0] for i in job.cursor.description]
+                job.record_set = job.cursor.fetchall()
+                timing.rows = len(job.record_set)
+                job.cursor.close()
+            elif job.cursor.description:
+                self.set_state(job, job.state_fetching)
+                job.headers = [i[0] for i in job.cursor.description]
+                self.stream = job
+                self.fetch(job)
+                timing.add('first_row', time.perf_counter() - started)
+            else:
+                timing.rows = max(0, job.cursor.rowcount)
+                job.cursor.close()
+        except mysql.connector.errors.Error as e:
+            job.fail(str(e))
+
+        # A "USE" in the SQL will have moved the session on
+        if is_use(job.sql) and not job.is_error:
+            self.record_use(job.database)
+
+        if self.stream is not job:
+            self.set_state(job, job.state_done)
+
+
+    def fetch(self, job):
+        started = time.perf_counter()
+        try:
+            rows = job.cursor.fetchmany(job.batch_size)
+        except mysql.connector.errors.Error as e:
+            job.fail(str(e))
+            self.close_stream()
+            return None
+
+        job.timing.add('fetch', time.perf_counter() - started)
+
+        job.has_more = len(rows) == job.batch_size
+        job.bytes+= rows_size(rows)
+        job.timing.rows+= len(rows)
+        job.timing.bytes = job.bytes
+
+        if job.has_more and job.memory_limit and job.bytes >= job.memory_limit:
+            job.truncated = True
+
+        job.complete = not job.has_more
+
+        self.executor.rows_fetched.emit(
+            job,
+            rows,
+            job.has_more and not job.truncated
+        )
+
+        if not job.has_more or job.truncated:
+            self.close_stream()
+
+
+    def close_stream(self):
+        job = self.stream
+        if job is None:
+            return None
+
+        self.stream = None
+
+        self.discard(job.cursor, job.has_more)
+
+        job.has_more = False
+        job.cursor = None
+        self.set_state(job, job.state_done)
+
+
+    def discard(self, cursor, has_more):
+        try:
+            # Unbuffered rows left on the wire must be read
+            # before the connection can be used again,
+            # stop the server sending them first
+            if has_more:
+                self.kill_query()
+
+            self.db_connection.consume_results()
+            cursor.close()
+        except mysql.connector.errors.Error:
+            # The next job will get a fresh connection
+            self.disconnect()
+
+
+    def run_script(self, job):
+        self.set_state(job, job.state_running)
+
+        for i, sql in enumerate(job.statements):
+            if job.cancelled:
+                break
+
+            result = StatementResult(
+                i,
+                sql,
+                Timing(job.name, sql, job.connection.get('name'), job.database)
+            )
+            started = time.perf_counter()
+
+            try:
+                self.connect()
+                self.change_database(job.database)
+                self.run_statement(job, result)
+            except mysql.connector.errors.Error as e:
+                result.error = str(e)
+
+            if is_use(sql) and not result.error:
+                self.record_use(job.database)
+
+            result.seconds = time.perf_counter() - started
+            result.timing.add('server', result.seconds)
+            result.timing.rows = result.rowcount
+            result.timing.error = result.error
+            self.executor.statement_finished.emit(job, result)
+
+            if result.error:
+                job.errors+= 1
+                if not job.continue_on_error:
+                    break
+
+        self.set_state(job, job.state_done)
+
+
+    def run_export(self, job):
+        self.set_state(job, job.state_running)
+        started = time.perf_counter()
+        cursor = None
+        writer = None
+
+        try:
+            self.connect()
+            self.change_database(job.database)
+
+            cursor = self.db_connection.cursor()
+            cursor.execute(job.sql)
+            if not cursor.description:
+                raise ValueError('The statement returned no rows to export')
+
+            job.headers = [i[0] for i in cursor.description]
+            writer = ExportWriter(job.path, job.format, job.compress)
+            writer.write_headers(job.headers)
+            self.set_state(job, job.state_fetching)
+
+            reported = time.perf_counter()
+            while not job.cancelled:
+                rows = cursor.fetchmany(job.batch_size)
+                if not rows:
+                    break
+
+                writer.write_rows(rows)
+                job.rows = writer.rows
+                job.bytes = writer.bytes
+
+                if time.perf_counter() - reported > job.progress_seconds:
+                    reported = time.perf_counter()
+                    self.executor.job_progress.emit(job)
+        except (mysql.connector.errors.Error, OSError, ValueError) as e:
+            job.fail(str(e))
+
+        if writer:
+            try:
+                writer.close()
+            except OSError as e:
+                job.fail(str(e))
+
+        if cursor:
+            self.discard(cursor, job.cancelled or job.is_error)
+
+        job.timing.rows = job.rows
+        job.timing.bytes = job.bytes
+        job.timing.add('fetch', time.perf_counter() - started)
+        self.set_state(job, job.state_done)
+
+
+    def run_profile(self, job):
+        self.set_state(job, job.state_running)
+        started = time.perf_counter()
+        cursor = None
+        profiler = None
+
+        try:
+            self.connect()
+            self.change_database(job.database)
+
+            cursor = self.db_connection.cursor()
+            cursor.execute(job.sql)
+            if not cursor.description:
+                raise ValueError('The statement returned no rows to profile')
+
+            job.headers = [i[0] for i in cursor.description]
+            profiler = Profiler(job.headers)
+            self.set_state(job, job.state_fetching)
+
+            reported = time.perf_counter()
+            while not job.cancelled:
+                rows = cursor.fetchmany(job.batch_size)
+                if not rows:
+                    break
+
+                profiler.add_rows(rows)
+                job.rows = profiler.rows
+
+                if time.perf_counter() - reported > job.progress_seconds:
+                    job.summary = profiler.summary()
+                    self.executor.job_progress.emit(job)
+                    reported = time.perf_counter()
+        except (mysql.connector.errors.Error, ValueError) as e:
+            job.fail(str(e))
+
+        if profiler:
+            job.summary = profiler.summary()
+
+        if cursor:
+            self.discard(cursor, job.cancelled or job.is_error)
+
+        job.timing.rows = job.rows
+        job.timing.add('fetch', time.perf_counter() - started)
+        self.set_state(job, job.state_done)
+
+
+    def run_import(self, job):
+        self.set_state(job, job.state_running)
+        started = time.perf_counter()
+
+        try:
+            columns, terminator = importer.read_header(job.path)
+            if not columns:
+                raise ValueError('The first line of the file should name the columns')
+
+            # A connection of it's own that may read local files,
+            # it is dropped afterwards so no other job can
+            self.disconnect()
+            self.pooled = PooledConnection(create_db_connection(
+                allow_local_infile=job.load_data,
+                **self.connection
+            ))
+            self.change_database(job.database)
+
+            if job.disable_checks:
+                self.execute_each(importer.disable_checks_sql, job.table)
+
+            try:
+                loaded = False
+                if job.load_data and importer.can_load_data(job.path):
+                    loaded = self.import_load_data(job, columns, terminator)
+
+                if not loaded and not job.cancelled:
+                    self.import_inserts(job, columns)
+            finally:
+                # DISABLE KEYS outlasts the connection on MyISAM tables
+                if job.disable_checks:
+                    self.execute_each(importer.enable_checks_sql, job.table)
+        except (mysql.connector.errors.Error, OSError, ValueError, csv.Error) as e:
+            job.fail(str(e))
+
+        self.disconnect()
+
+        job.timing.rows = job.rows
+        job.timing.add('server', time.perf_counter() - started)
+        self.set_state(job, job.state_done)
+
+
+    def import_load_data(self, job, columns, terminator):
+        """False if the server or the client won't allow it"""
+        job.method = 'LOAD DATA'
+        self.executor.job_progress.emit(job)
+
+        cursor = self.db_connection.cursor()
+        try:
+            cursor.execute(importer.load_data_sql(
+                job.path,
+                job.table,
+                columns,
+                terminator
+            ))
+        except mysql.connector.errors.Error as e:
+            if job.cancelled or e.errno not in local_infile_errors:
+                raise
+
+            return False
+
+        job.rows = max(0, cursor.rowcount)
+        cursor.close()
+
+        return True
+
+
+    def import_inserts(self, job, columns):
+        job.method = 'INSERT'
+        sql = importer.insert_sql(job.table, columns)
+        reported = time.perf_counter()
+
+        cursor = self.db_connection.cursor()
+        for rows in importer.csv_batches(job.path, job.chunk_size):
+            if job.cancelled:
+                break
+
+            self.db_connection.start_transaction()
+            try:
+                cursor.executemany(sql, rows)
+                self.db_connection.commit()
+            except mysql.connector.errors.Error:
+                self.db_connection.rollback()
+                raise
+
+            job.rows+= len(rows)
+            if time.perf_counter() - reported > job.progress_seconds:
+                reported = time.perf_counter()
+                self.executor.job_progress.emit(job)
+
+        cursor.close()
+
+
+    def execute_each(self, statements, table):
+        cursor = self.db_connection.cursor()
+        for sql in statements:
+            cursor.execute(sql.replace('%s', table))
+
+        cursor.close()
+
+
+    def run_statement(self, job, result):
+        cursor = self.db_connection.cursor(raw=job.raw)
+        cursor.execute(result.sql)
+
+        if not cursor.description:
+            result.rowcount = max(0, cursor.rowcount)
+            cursor.close()
+            return None
+
+        result.headers = [i[0] for i in cursor.description]
+        result.rows = cursor.fetchmany(job.result_rows + 1)
+        result.truncated = len(result.rows) > job.result_rows
+
+        if result.truncated:
+            result.rows.pop()
+
+        result.rowcount = len(result.rows)
+        self.discard(cursor, result.truncated)
+
+
+    def kill(self, job):
+        """
+        Called from the GUI thread, the KILL goes over a connection of it's
+        own on a thread of it's own, as the server may be slow to answer
+        """
+        def kill():
+            try:
+                if job.state == job.state_running and self.db_connection:
+                    self.kill_query()
+            except mysql.connector.errors.Error:
+                pass
+
+        threading.Thread(target=kill, daemon=True).start()
+
+
+    def kill_query(self):
+        killer = create_db_connection(**self.connection)
+        try:
+            cursor = killer.cursor()
+            cursor.execute('KILL QUERY %d' % self.db_connection.connection_id)
+            cursor.close()
+        finally:
+            killer.close()
+
+
+    def disconnect(self):
+        """Back to the pool, which drops it if it's no longer fit to use"""
+        pooled = self.pooled
+        self.pooled = None
+        if pooled is None:
+            return None
+
+        if pooled.pool is None:
+            pooled.close()
+        else:
+            pooled.pool.checkin(pooled)
+
+
+    def set_state(self, job, state):
+        job.state = state
+        self.executor.job_changed.emit(job, state)
+
+
+def is_use(sql):
+    return re.match(r'\s*use\s', sql, re.IGNORECASE) is not None
+
+
+# Errors for LOAD DATA LOCAL being turned off, on the server or the client
+local_infile_errors = (1148, 2068, 3948, 3950)
+
+
+def rows_size(rows):
+    """Rough number of bytes of memory the rows take up"""
+    size = 0
+    for row in rows:
+        size+= sys.getsizeof(row)
+        for value in row:
+            size+= sys.getsizeof(value)
+
+    return size
+
+
+class QueryExecutor(QObject):
+    """
+    Runs SQL off the GUI thread
+    Each tab gets a session of it's own on each connection so they can run
+    at the same time, a session runs it's jobs in order
+    (jobs named in "session_names" share a session, the data tab's on
+    "browse", the schema tab's, key, long value and table size reads on
+    "schema" so they can't hold up a page of data)
+    The latest job for each tab is kept in self.jobs
+    and the "state_changed" & "finished" events are triggered on the GUI thread
+    """
+    job_changed = pyqtSignal(object, str)
+    session_names = {
+        'data'        : 'browse',
+        'data_keys'   : 'schema',
+        'data_value'  : 'schema',
+        'table_sizes' : 'schema',
+    }
+    # Sessions of short internal jobs, whose connection goes back
+    # to the pool after each one
+    borrow_sessions = {'schema', 'plan', 'limit_guard', 'exact_count', 'data_prefetch'}
+    rows_fetched = pyqtSignal(object, list, bool)
+    statement_finished = pyqtSignal(object, object)
+    job_progress = pyqtSignal(object)
+
+    def __init__(self):
+        super().__init__()
+        self.sessions = {}
+        self.jobs = {}
+        self.event_bindings = {}
+        self.raw = False
+        self.memory_limit = None
+        self.job_changed.connect(self.job_changed_handler)
+        self.rows_fetched.connect(self.rows_fetched_handler)
+        self.statement_finished.connect(self.statement_finished_handler)
+        self.job_progress.connect(self.job_progress_handler)
+
+
+    def trigger(self, event_name, args=None):
+        if event_name in self.event_bindings:
+            for binding in self.event_bindings[event_name]:
+                if args is None:
+                    binding()
+                else:
+                    binding(*args)
+
+
+    def bind(self, event_name, event_callback):
+        if event_name not in self.event_bindings:
+            self.event_bindings[event_name] = []
+
+        self.event_bindings[event_name].append(event_callback)
+
+
+    def session_key(self, connection, job_name):
+        return (
+            connection['name'],
+            self.session_names.get(job_name, job_name)
+        )
+
+
+    def database_for(self, connection, job_name, database):
+        """The database the tab's next job would run in"""
+        session = self.sessions.get(self.session_key(connection, job_name))
+        if session is None:
+            return database
+
+        return session.database_for(database)
+
+
+    def session(self, connection, job_name):
+        key = self.session_key(connection, job_name)
+
+        if key not in self.sessions:
+            self.sessions[key] = Session(
+                {k: v for k, v in connection.items()
+                    if k in ['host', 'password', 'user', 'port']},
+                self,
+                connection.get('pool'),
+                key[1] in self.borrow_sessions
+            )
+
+        return self.sessions[key]
+
+
+    def submit(self, name, sql, connection, database=None,
+            collect=False, on_finished=None, batch_size=None):
+        job = QueryJob(
+            name,
+            sql,
+            connection,
+            database,
+            self.raw,
+            self.memory_limit
+        )
+        job.collect = collect
+        job.on_finished = on_finished
+        if batch_size:
+            job.batch_size = batch_size
+        self.jobs[name] = job
+        self.trigger('state_changed', (job,))
+        self.session(connection, name).submit(job)
+
+        return job
+
+
+    def submit_script(self, name, statements, connection, database=None,
+            continue_on_error=False, on_statement=None, on_finished=None):
+        job = ScriptJob(
+            name,
+            statements,
+            connection,
+            database,
+            continue_on_error,
+            self.raw
+        )
+        job.on_statement = on_statement
+        job.on_finished = on_finished
+        self.jobs[name] = job
+        self.trigger('state_changed', (job,))
+        self.session(connection, name).submit(job)
+
+        return job
+
+
+    def submit_export(self, name, sql, connection, database, path, format,
+            compress=False, on_progress=None, on_finished=None):
+        job = ExportJob(name, sql, connection, database, path, format, compress)
+        job.on_progress = on_progress
+        job.on_finished = on_finished
+        self.jobs[name] = job
+        self.trigger('state_changed', (job,))
+        self.session(connection, name).submit(job)
+
+        return job
+
+
+    def submit_profile(self, name, sql, connection, database,
+            on_progress=None, on_finished=None):
+        job = ProfileJob(name, sql, connection, database)
+        job.on_progress = on_progress
+        job.on_finished = on_finished
+        self.jobs[name] = job
+        self.trigger('state_changed', (job,))
+        self.session(connection, name).submit(job)
+
+        return job
+
+
+    def submit_import(self, name, connection, database, path, table,
+            chunk_size=1000, load_data=True, disable_checks=False,
+            on_progress=None, on_finished=None):
+        job = ImportJob(
+            name,
+            connection,
+            database,
+            path,
+            table,
+            chunk_size,
+            load_data,
+            disable_checks
+        )
+        job.on_progress = on_progress
+        job.on_finished = on_finished
+        self.jobs[name] = job
+        self.trigger('state_changed', (job,))
+        self.session(connection, name).submit(job)
+
+        return job
+
+
+    def forget(self, name):
+        """Whatever the tab's current job returns is no longer wanted"""
+        self.jobs.pop(name, None)
+
+
+    def cancel(self, name):
+        """Jobs still queued aren't run, scripts stop before their next statement"""
+        if name in self.jobs:
+            self.jobs[name].cancelled = True
+
+
+    def kill(self, name):
+        """Stop the statement the job is running on the server"""
+        if name in self.jobs:
+            job = self.jobs[name]
+            job.cancelled = True
+            self.session(job.connection, name).kill(job)
+
+
+    def fetch_more(self, job):
+        self.session(job.connection, job.name).fetch_more(job)
+
+
+    def state(self, name):
+        if name not in self.jobs:
+            return None
+
+        return self.jobs[name].state
+
+
+    def job_changed_handler(self, job, state):
+        # Results for a tab that has since been given a newer job are stale
+        if self.jobs.get(job.name) is not job:
+            return None
+
+        self.trigger('state_changed', (job,))
+        if state == job.state_done:
+            if job.on_finished:
+                job.on_finished(job)
+            else:
+                self.trigger('finished', (job,))
+
+
+    def rows_fetched_handler(self, job, rows, has_more):
+        if self.jobs.get(job.name) is not job:
+            return None
+
+        self.trigger('rows', (job, rows, has_more))
+
+
+    def statement_finished_handler(self, job, result):
+        if self.jobs.get(job.name) is not job:
+            return None
+
+        if job.on_statement:
+            job.on_statement(job, result)
+
+
+    def job_progress_handler(self, job):
+        if self.jobs.get(job.name) is not job:
+            return None
+
+        if job.on_progress:
+            job.on_progress(job)
+
+
+    def close_sessions(self, connection_name):
+        for key in list(self.sessions):
+            if key[0] == connection_name:
+                self.sessions.pop(key).stop()
+
+
+    def shutdown(self):
+        for key in list(self.sessions):
+            self.sessions.pop(key).stop()
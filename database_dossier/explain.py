@@ -0,0 +1,296 @@
+"""
+    Database Dossier - A User Interface for your databases
+    Copyright (C) 2023  Nicholas Shiell
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+
+import re, json
+
+
+def explain_sql(sql):
+    return 'EXPLAIN FORMAT=JSON ' + strip_semicolon(sql)
+
+
+def analyze_sql(sql, server_info):
+    """
+    MariaDB has ANALYZE, MySQL (8.0.18 and later) has EXPLAIN ANALYZE,
+    a server whose version isn't known yet is taken to be MySQL
+    """
+    if server_info and 'mariadb' in server_info.lower():
+        return 'ANALYZE FORMAT=JSON ' + strip_semicolon(sql)
+
+    return 'EXPLAIN ANALYZE ' + strip_semicolon(sql)
+
+
+def strip_semicolon(sql):
+    return sql.strip().rstrip(';').strip()
+
+
+class PlanNode:
+    """One step of a query plan, warning is set for full scans and filesorts"""
+    def __init__(self, operation, table=None, access=None, rows=None,
+            cost=None, key=None, notes=None):
+        self.operation = operation
+        self.table = table
+        self.access = access
+        self.rows = rows
+        self.cost = cost
+        self.key = key
+        self.notes = notes or []
+        self.children = []
+        self.warning = None
+
+
+    @property
+    def columns(self):
+        return [
+            self.operation,
+            self.table or '',
+            self.access or '',
+            '' if self.rows is None else str(self.rows),
+            '' if self.cost is None else str(self.cost),
+            self.key or '',
+            ', '.join(self.notes)
+        ]
+
+
+headers = ['Operation', 'Table', 'Access', 'Rows', 'Cost', 'Key', 'Notes']
+
+
+def parse_plan(text):
+    """
+    The root PlanNode of EXPLAIN / ANALYZE output,
+    either JSON (EXPLAIN FORMAT=JSON, MariaDB ANALYZE FORMAT=JSON)
+    or the text tree of MySQL EXPLAIN ANALYZE
+    """
+    if isinstance(text, (bytes, bytearray)):
+        text = text.decode('utf-8')
+
+    text = text.strip()
+    if text.startswith('{'):
+        root = PlanNode('query')
+        json_children(root, json.loads(text))
+        return root
+
+    return parse_tree(text)
+
+
+def json_children(parent, data):
+    for key, value in data.items():
+        if isinstance(value, dict):
+            parent.children.append(json_node(key, value))
+        elif isinstance(value, list):
+            for item in value:
+                if isinstance(item, dict):
+                    json_children(parent, item)
+
+
+def json_node(operation, data):
+    if operation == 'table':
+        node = json_table(data)
+    else:
+        node = PlanNode(operation.replace('_', ' '))
+        node.cost = json_cost(data)
+        if 'select_id' in data:
+            node.operation+= ' #%s' % data['select_id']
+
+    if data.get('using_filesort') or operation == 'filesort':
+        node.notes.append('filesort')
+        node.warning = 'Filesort'
+
+    if data.get('using_temporary_table') or data.get('temporary_table'):
+        node.notes.append('temporary table')
+
+    json_children(node, {k: v for k, v in data.items() if k != 'cost_info'})
+
+    return node
+
+
+def json_table(data):
+    rows = data.get('rows_examined_per_scan', data.get('rows'))
+    if 'r_rows' in data:
+        rows = '%s (actual %s)' % (rows, data['r_rows'])
+
+    node = PlanNode(
+        'table',
+        table  = data.get('table_name'),
+        access = data.get('access_type'),
+        rows   = rows,
+        cost   = json_cost(data),
+        key    = data.get('key')
+    )
+
+    if 'attached_condition' in data:
+        node.notes.append('where ' + data['attached_condition'])
+
+    if data.get('using_index'):
+        node.notes.append('covering index')
+
+    if node.access == 'ALL':
+        node.warning = 'Full table scan'
+    elif node.access == 'index':
+        node.warning = 'Full index scan'
+
+    return node
+
+
+def json_cost(data):
+    cost_info = data.get('cost_info', {})
+    for key in ['query_cost', 'prefix_cost', 'sort_cost', 'read_cost']:
+        if key in cost_info:
+            return cost_info[key]
+
+    if 'r_total_time_ms' in data:
+        return '%s ms' % data['r_total_time_ms']
+
+    return None
+
+
+tree_line = re.compile(r'^(\s*)-> (.*?)(?:  \((cost=[^)]*)\))?(?:  ?\((actual [^)]*)\))?\s*$')
+
+
+def parse_tree(text):
+    """
+    MySQL's EXPLAIN ANALYZE lines look like:
+    -> Table scan on t  (cost=1.2 rows=10) (actual time=0.1..0.2 rows=10 loops=1)
+    nesting is by indentation
+    """
+    root = PlanNode('query')
+    stack = [(-1, root)]
+
+    for line in text.split('\n'):
+        match = tree_line.match(line)
+        if not match:
+            if line.strip() and len(stack) > 1:
+                stack[-1][1].notes.append(line.strip())
+            continue
+
+        indent, operation, cost, actual = match.groups()
+        node = PlanNode(operation)
+
+        if cost:
+            values = dict(re.findall(r'(\w+)=([\w.]+)', cost))
+            node.cost = values.get('cost')
+            node.rows = values.get('rows')
+
+        if actual:
+            node.notes.append(actual)
+            rows = re.search(r'rows=([\w.]+)', actual)
+            if rows:
+                node.rows = '%s (actual %s)' % (node.rows, rows.group(1))
+
+        table = re.search(r' on (\S+)', operation)
+        if table:
+            node.table = table.group(1)
+
+        if operation.startswith('Table scan'):
+            node.warning = 'Full table scan'
+        elif operation.startswith('Index scan'):
+            node.warning = 'Full index scan'
+        elif operation.startswith('Sort'):
+            node.warning = 'Filesort'
+
+        while stack[-1][0] >= len(indent):
+            stack.pop()
+
+        stack[-1][1].children.append(node)
+        stack.append((len(indent), node))
+
+    return root
+
+
+# Strings, quoted names and comments, which may hold anything
+quoted = re.compile(
+    r"'(?:[^'\\]|\\.)*'|\"(?:[^\"\\]|\\.)*\"|`[^`]*`|/\*.*?\*/|(?:--\s|#)[^\n]*",
+    re.DOTALL
+)
+
+# Clauses that already bound the rows, or that a LIMIT can't simply follow
+bounded = re.compile(
+    r'\b(limit|into|for\s+update|lock\s+in\s+share\s+mode|for\s+share|procedure)\b',
+    re.IGNORECASE
+)
+
+# Looked for in top_level() SQL, where a call's brackets are left as []
+aggregate = re.compile(r'\b(count|sum|avg|min|max|group_concat)\s*\[\]', re.IGNORECASE)
+
+
+def top_level(sql):
+    """The SQL with quoted text blanked out and everything in brackets
+    replaced by [], leaving only the outermost statement to look at"""
+    sql = quoted.sub(' ', sql)
+    while True:
+        inner = re.sub(r'\([^()]*\)', '[]', sql)
+        if inner == sql:
+            return sql
+
+        sql = inner
+
+
+def is_unbounded_select(sql):
+    """
+    A SELECT that could return every row of a table, one without a LIMIT.
+    Aggregates without a GROUP BY are left alone as they give one row
+    """
+    outer = top_level(strip_semicolon(sql))
+    if not re.match(r'\s*select\b', outer, re.IGNORECASE):
+        return False
+
+    if bounded.search(outer):
+        return False
+
+    if aggregate.search(outer) and not re.search(
+            r'\bgroup\s+by\b', outer, re.IGNORECASE):
+        return False
+
+    return True
+
+
+def with_limit(sql, limit):
+    """On a line of it's own in case the SQL ends with a -- comment"""
+    return '%s\nLIMIT %d' % (strip_semicolon(sql), limit)
+
+
+def estimate_rows(headers, rows):
+    """
+    The rows a query is expected to return from plain EXPLAIN, the rows
+    of each table of the outer SELECT times the percentage its WHERE lets
+    through, multiplied together as the joins would be. None if the
+    server gave no estimate
+    """
+    if not headers or 'rows' not in headers:
+        return None
+
+    names = [str(header).lower() for header in headers]
+    id_col = names.index('id') if 'id' in names else None
+    rows_col = names.index('rows')
+    filtered_col = names.index('filtered') if 'filtered' in names else None
+
+    outer_id = rows[0][id_col] if rows and id_col is not None else None
+    estimate = None
+    for row in rows:
+        if id_col is not None and row[id_col] != outer_id:
+            continue
+
+        if row[rows_col] is None:
+            continue
+
+        table_rows = float(row[rows_col])
+        if filtered_col is not None and row[filtered_col] is not None:
+            table_rows*= float(row[filtered_col]) / 100
+
+        estimate = max(table_rows, 1) * (1 if estimate is None else estimate)
+
+    return None if estimate is None else int(estimate)
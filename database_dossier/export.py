@@ -0,0 +1,168 @@
+"""
+    Database Dossier - A User Interface for your databases
+    Copyright (C) 2023  Nicholas Shiell
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+
+import io, csv, json, gzip
+from datetime import datetime, date, time, timedelta
+from decimal import Decimal
+from .quoting import format_timedelta
+
+
+format_csv   = 'csv'
+format_tsv   = 'tsv'
+format_jsonl = 'jsonl'
+
+# Name and extension of each format, in the order offered
+formats = [
+    (format_csv,   'CSV',        '.csv'),
+    (format_tsv,   'TSV',        '.tsv'),
+    (format_jsonl, 'JSON Lines', '.jsonl'),
+]
+
+
+def file_filters():
+    """For QFileDialog, each format plain and gzipped"""
+    filters = []
+    for format, name, extension in formats:
+        filters.append('%s (*%s)' % (name, extension))
+        filters.append('%s gzip (*%s.gz)' % (name, extension))
+
+    return ';;'.join(filters)
+
+
+def format_from_path(path, file_filter=''):
+    """
+    (path, format, compress) from the file name, or failing that the
+    filter picked in the file dialog, whose extension is then added
+    """
+    compress = path.endswith('.gz')
+    name = path[:-3] if compress else path
+
+    for format, format_name, extension in formats:
+        if name.endswith(extension):
+            return (path, format, compress)
+
+    for format, format_name, extension in formats:
+        if file_filter.startswith(format_name + ' '):
+            compress = ' gzip ' in file_filter
+            return (
+                name + extension + ('.gz' if compress else ''),
+                format,
+                compress
+            )
+
+    return (path + '.csv', format_csv, False)
+
+
+def text_value(value):
+    if value is None:
+        return ''
+
+    if isinstance(value, (bytes, bytearray)):
+        return bytes(value).decode('utf-8', 'replace')
+
+    if isinstance(value, datetime):
+        return value.isoformat(' ')
+
+    if isinstance(value, timedelta):
+        return format_timedelta(value)
+
+    return value
+
+
+def json_value(value):
+    """For the types json can't write itself"""
+    if isinstance(value, Decimal):
+        return str(value)
+
+    if isinstance(value, (bytes, bytearray)):
+        return bytes(value).decode('utf-8', 'replace')
+
+    if isinstance(value, datetime):
+        return value.isoformat(' ')
+
+    if isinstance(value, (date, time)):
+        return value.isoformat()
+
+    if isinstance(value, timedelta):
+        return format_timedelta(value)
+
+    if isinstance(value, set):
+        return sorted(value)
+
+    return str(value)
+
+
+class ExportWriter:
+    """
+    Writes rows to a file a batch at a time, so nothing more than a
+    batch is ever held. Each batch is formatted into a string and written
+    in one go, "bytes" counts the text written before any compression
+    """
+    def __init__(self, path, format, compress=False):
+        self.format = format
+        self.rows = 0
+        self.bytes = 0
+        self.headers = None
+
+        if compress:
+            self.file = gzip.open(path, 'wt', encoding='utf-8', newline='',
+                compresslevel=6)
+        else:
+            self.file = open(path, 'w', encoding='utf-8', newline='')
+
+
+    def write_headers(self, headers):
+        self.headers = headers
+        if self.format != format_jsonl:
+            self.write(self.csv_text([headers]))
+
+
+    def write_rows(self, rows):
+        if self.format == format_jsonl:
+            headers = self.headers
+            text = ''.join(
+                json.dumps(dict(zip(headers, row)), default=json_value,
+                    ensure_ascii=False) + '\n'
+                for row in rows
+            )
+        else:
+            text = self.csv_text([text_value(value) for value in row] for row in rows)
+
+        self.write(text)
+        self.rows+= len(rows)
+
+
+    def csv_text(self, rows):
+        buffer = io.StringIO()
+        writer = csv.writer(
+            buffer,
+            'excel-tab' if self.format == format_tsv else 'excel',
+            lineterminator='\n'
+        )
+        writer.writerows(rows)
+
+        return buffer.getvalue()
+
+
+    def write(self, text):
+        self.file.write(text)
+        self.bytes+= len(text)
+
+
+    def close(self):
+        self.file.close()
@@ -0,0 +1,129 @@
+"""
+    Database Dossier - A User Interface for your databases
+    Copyright (C) 2023  Nicholas Shiell
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+
+import re
+from numbers import Number
+from .quoting import quote_identifier, sql_literal
+
+
+help_text = (
+    'Filter: text to search for, ~regular expression, =value, !=value, '
+    '<value, >value, <=value, >=value, null or not null'
+)
+
+operators = ('<=', '>=', '!=', '<>', '=', '<', '>')
+
+
+def parse_filter(text):
+    """
+    The (operator, value) a column filter box holds
+    operator is one of the operators, 'like', 'regexp', 'null' or 'not null'
+    None if the box is empty
+    """
+    text = text.strip()
+    if not text:
+        return None
+
+    if text.lower() in ('null', 'not null'):
+        return (text.lower(), None)
+
+    if text.startswith('~'):
+        return ('regexp', text[1:])
+
+    for operator in operators:
+        if text.startswith(operator):
+            return ('!=' if operator == '<>' else operator, text[len(operator):].strip())
+
+    return ('like', text)
+
+
+def filter_sql(column, text):
+    """The WHERE condition for a column filter, which an index can use
+    unless it is a search"""
+    parsed = parse_filter(text)
+    if parsed is None:
+        return None
+
+    operator, value = parsed
+    column = quote_identifier(column)
+
+    if operator == 'null':
+        return '%s IS NULL' % column
+
+    if operator == 'not null':
+        return '%s IS NOT NULL' % column
+
+    if operator == 'like':
+        value = re.sub(r'([\\%_])', r'\\\1', value)
+        return '%s LIKE %s' % (column, sql_literal('%' + value + '%'))
+
+    if operator == 'regexp':
+        return '%s REGEXP %s' % (column, sql_literal(value))
+
+    return '%s %s %s' % (column, operator, sql_literal(value))
+
+
+def filter_matches(value, parsed):
+    """Client side version of filter_sql for a value of a result set"""
+    operator, text = parsed
+    if operator == 'null':
+        return value is None
+
+    if operator == 'not null':
+        return value is not None
+
+    if value is None:
+        return False
+
+    if isinstance(value, (bytes, bytearray)):
+        value = bytes(value).decode('utf-8', 'replace')
+
+    if operator == 'like':
+        return text.lower() in str(value).lower()
+
+    if operator == 'regexp':
+        return bool(compile_regexp(text).search(str(value)))
+
+    if isinstance(value, Number) and not isinstance(value, bool):
+        try:
+            value, other = float(value), float(text)
+        except ValueError:
+            value, other = str(value), text
+    else:
+        value, other = str(value), text
+
+    if operator == '=':
+        return value == other
+    if operator == '!=':
+        return value != other
+    if operator == '<':
+        return value < other
+    if operator == '>':
+        return value > other
+    if operator == '<=':
+        return value <= other
+
+    return value >= other
+
+
+def compile_regexp(text):
+    """Case insensitive like the server, a bad pattern is searched for as text"""
+    try:
+        return re.compile(text, re.IGNORECASE)
+    except re.error:
+        return re.compile(re.escape(text), re.IGNORECASE)
@@ -0,0 +1,165 @@
+"""
+    Database Dossier - A User Interface for your databases
+    Copyright (C) 2023  Nicholas Shiell
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+
+import os, re, sqlite3
+
+
+class HistoryEntry:
+    def __init__(self, id, at, name, connection, database, sql, seconds, rows,
+            error, timing=None):
+        self.id = id
+        self.at = at
+        self.name = name
+        self.connection = connection
+        self.database = database
+        self.sql = sql
+        self.seconds = seconds
+        self.rows = rows
+        self.error = error
+        # The breakdown, only for statements run since opening
+        self.timing = timing
+
+
+class QueryHistory:
+    """
+    Every statement run, kept in SQLite so it outlives the session
+
+    The SQL is indexed with FTS5 so searching is a lookup of the words
+    typed rather than a scan of every statement. SQLite built without
+    FTS5 falls back to LIKE, which is a scan but still works
+    """
+    columns = 'id, at, name, connection, database, sql, seconds, rows, error'
+
+    def __init__(self, path):
+        directory = os.path.split(path)[0]
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+
+        self.db = sqlite3.connect(path)
+        self.db.execute('PRAGMA journal_mode = WAL')
+        self.db.execute('PRAGMA synchronous = NORMAL')
+        self.db.execute('''
+            CREATE TABLE IF NOT EXISTS history (
+                id INTEGER PRIMARY KEY,
+                at REAL NOT NULL,
+                name TEXT,
+                connection TEXT,
+                database TEXT,
+                sql TEXT NOT NULL,
+                seconds REAL,
+                rows INTEGER,
+                error TEXT
+            )
+        ''')
+        self.db.execute(
+            'CREATE INDEX IF NOT EXISTS history_connection ON history (connection)'
+        )
+        self.has_fts = self.create_fts()
+        self.db.commit()
+
+
+    def create_fts(self):
+        """The index is kept up to date by triggers"""
+        try:
+            self.db.execute('''
+                CREATE VIRTUAL TABLE IF NOT EXISTS history_fts USING fts5(
+                    sql, content='history', content_rowid='id'
+                )
+            ''')
+        except sqlite3.OperationalError:
+            return False
+
+        self.db.executescript('''
+            CREATE TRIGGER IF NOT EXISTS history_insert AFTER INSERT ON history
+            BEGIN
+                INSERT INTO history_fts (rowid, sql) VALUES (new.id, new.sql);
+            END;
+
+            CREATE TRIGGER IF NOT EXISTS history_delete AFTER DELETE ON history
+            BEGIN
+                INSERT INTO history_fts (history_fts, rowid, sql)
+                VALUES ('delete', old.id, old.sql);
+            END;
+        ''')
+
+        return True
+
+
+    def add(self, timing):
+        self.db.execute(
+            'INSERT INTO history (at, name, connection, database, sql, seconds, '
+            'rows, error) VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+            (
+                timing.at,
+                timing.name,
+                timing.connection,
+                timing.database,
+                timing.sql,
+                timing.total,
+                timing.rows,
+                timing.error
+            )
+        )
+        self.db.commit()
+
+
+    def search(self, text='', connection=None, errors=None, limit=1000):
+        """
+        The newest entries first. Each word of text must be in the SQL,
+        the last one may be the start of a word as it is still being typed
+        """
+        where = []
+        params = []
+        words = re.findall(r'\w+', text)
+
+        if words and self.has_fts:
+            where.append('id IN (SELECT rowid FROM history_fts WHERE history_fts MATCH ?)')
+            params.append(' '.join('"%s"' % word for word in words) + '*')
+        else:
+            for word in words:
+                where.append('sql LIKE ?')
+                params.append('%' + word + '%')
+
+        if connection is not None:
+            where.append('connection = ?')
+            params.append(connection)
+
+        if errors is not None:
+            where.append('error IS NOT NULL' if errors else 'error IS NULL')
+
+        sql = 'SELECT %s FROM history' % self.columns
+        if where:
+            sql+= ' WHERE ' + ' AND '.join(where)
+
+        sql+= ' ORDER BY id DESC LIMIT ?'
+        params.append(limit)
+
+        return [HistoryEntry(*row) for row in self.db.execute(sql, params)]
+
+
+    def count(self):
+        return self.db.execute('SELECT COUNT(*) FROM history').fetchone()[0]
+
+
+    def clear(self):
+        self.db.execute('DELETE FROM history')
+        self.db.commit()
+
+
+    def close(self):
+        self.db.close()
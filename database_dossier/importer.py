@@ -0,0 +1,105 @@
+"""
+    Database Dossier - A User Interface for your databases
+    Copyright (C) 2023  Nicholas Shiell
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+
+import csv, gzip
+from .quoting import quote_identifier, sql_literal
+
+
+def open_csv(path):
+    """The first row holds the column names, empty fields are loaded as NULL"""
+    if path.endswith('.gz'):
+        return gzip.open(path, 'rt', encoding='utf-8-sig', newline='')
+
+    return open(path, 'r', encoding='utf-8-sig', newline='')
+
+
+def read_header(path):
+    """(column names, line terminator) from the first line of the file"""
+    with open_csv(path) as file:
+        line = file.readline()
+
+    terminator = '\r\n' if line.endswith('\r\n') else '\n'
+    header = next(csv.reader([line.rstrip('\r\n')]), [])
+
+    return ([name.strip() for name in header], terminator)
+
+
+def csv_batches(path, size):
+    """The rows after the header, "size" at a time"""
+    with open_csv(path) as file:
+        reader = csv.reader(file)
+        next(reader, None)
+
+        batch = []
+        for row in reader:
+            batch.append([None if value == '' else value for value in row])
+            if len(batch) == size:
+                yield batch
+                batch = []
+
+        if batch:
+            yield batch
+
+
+def can_load_data(path):
+    """The server reads the file as it is, so it can't be compressed"""
+    return not path.endswith('.gz')
+
+
+def load_data_sql(path, table, columns, terminator='\n'):
+    """
+    The fields are read into variables so that empty ones can be NULL,
+    as they are when inserting. A "" inside quotes is a "
+    """
+    variables = ['@c%d' % i for i in range(len(columns))]
+
+    return (
+        "LOAD DATA LOCAL INFILE %s INTO TABLE %s CHARACTER SET utf8mb4 "
+        "FIELDS TERMINATED BY ',' OPTIONALLY ENCLOSED BY '\"' ESCAPED BY '' "
+        "LINES TERMINATED BY %s IGNORE 1 LINES (%s) SET %s"
+    ) % (
+        sql_literal(path),
+        table,
+        sql_literal(terminator),
+        ', '.join(variables),
+        ', '.join('%s = NULLIF(%s, \'\')' % (quote_identifier(column), variable)
+            for column, variable in zip(columns, variables))
+    )
+
+
+def insert_sql(table, columns):
+    """For executemany, which sends each batch as one multi-row INSERT"""
+    return 'INSERT INTO %s (%s) VALUES (%s)' % (
+        table,
+        ', '.join(quote_identifier(column) for column in columns),
+        ', '.join(['%s'] * len(columns))
+    )
+
+
+# Run before and after a load when checks are turned off
+disable_checks_sql = [
+    'SET unique_checks = 0',
+    'SET foreign_key_checks = 0',
+    'ALTER TABLE %s DISABLE KEYS',
+]
+
+enable_checks_sql = [
+    'ALTER TABLE %s ENABLE KEYS',
+    'SET foreign_key_checks = 1',
+    'SET unique_checks = 1',
+]
@@ -0,0 +1,207 @@
+"""
+    Database Dossier - A User Interface for your databases
+    Copyright (C) 2023  Nicholas Shiell
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+
+import operator
+from datetime import datetime, date
+from .result_set import DiskResultSet, Column, epoch, microsecond, numpy
+from .filters import filter_matches, compile_regexp
+
+
+comparisons = {
+    '='  : operator.eq,
+    '!=' : operator.ne,
+    '<'  : operator.lt,
+    '>'  : operator.gt,
+    '<=' : operator.le,
+    '>=' : operator.ge,
+}
+
+
+def is_vectorised():
+    """Whole columns can be worked on when NumPy is installed"""
+    return numpy is not None
+
+
+def load_columns(result_set, cols):
+    """
+    {column number: Column} for every row of the result set. The pages of
+    a result spilled to disk are read once, in order, rather than jumping
+    between them row by row
+    """
+    if isinstance(result_set, DiskResultSet):
+        return result_set.load_columns(cols)
+
+    return {col: result_set.column(col) for col in cols}
+
+
+def order_rows(columns, length, filters, keys):
+    """
+    (row numbers, what was done) for the rows passing filters in the
+    order of keys, None for the row numbers if there was nothing to do.
+    columns are from load_columns(), they don't need the result set so
+    this can run on a thread of it's own
+    """
+    done = []
+    rows = None
+    if filters:
+        rows = filter_rows(columns, length, filters)
+        done.append('filtered')
+
+    if keys:
+        rows = sort_rows(columns, length, keys, rows)
+        done.append('sorted')
+
+    return (rows, ' and '.join(done))
+
+
+def sort_rows(columns, length, keys, rows=None):
+    """
+    The row numbers 0 to length in the order of keys,
+    (column number, descending) pairs, most significant first
+    Nulls go last either way. Only the row numbers in rows when given
+    """
+    if rows is None:
+        rows = range(length)
+
+    if is_vectorised():
+        rows = numpy.asarray(rows, dtype='int64')
+
+        # lexsort's last key is the most significant
+        sort_keys = []
+        for col, descending in reversed(keys):
+            column = columns[col]
+            values = sort_values(column, rows)
+            if descending:
+                values = -values if values.dtype.kind == 'f' else ~values
+
+            sort_keys.append(values)
+            sort_keys.append(column.null_mask()[rows].astype('int8'))
+
+        return rows[numpy.lexsort(sort_keys)]
+
+    order = list(rows)
+    for col, descending in reversed(keys):
+        column = columns[col]
+        present = [i for i in order if not column.is_null(i)]
+        nulls = [i for i in order if column.is_null(i)]
+        value = column.value
+
+        try:
+            present.sort(key=value, reverse=descending)
+        except TypeError:
+            present.sort(key=lambda i: str(value(i)), reverse=descending)
+
+        order = present + nulls
+
+    return order
+
+
+def sort_values(column, rows):
+    """
+    An array that sorts as the column does, the column's own array
+    when it has one, otherwise the rank of each value among the distinct
+    values, which is how text, decimals and the like are compared
+    """
+    values = column.numpy()
+    if values is not None:
+        if column.kind == Column.kind_float:
+            return values[rows]
+
+        return values[rows].astype('int64')
+
+    values = [column.value(int(i)) for i in rows]
+    distinct = set(value for value in values if value is not None)
+
+    try:
+        ranks = {value: rank for rank, value in enumerate(sorted(distinct))}
+    except TypeError:
+        ranks = {value: rank for rank, value in enumerate(sorted(distinct, key=str))}
+
+    return numpy.array([ranks.get(value, 0) for value in values], dtype='int64')
+
+
+def filter_rows(columns, length, filters):
+    """
+    The row numbers of the rows that pass every filter,
+    {column number: filter from filters.parse_filter()}
+    """
+    if is_vectorised():
+        mask = numpy.ones(length, dtype=bool)
+        for col, parsed in filters.items():
+            mask&= filter_mask(columns[col], parsed)[:length]
+
+        return numpy.flatnonzero(mask)
+
+    return [i for i in range(length) if all(
+        filter_matches(columns[col].value(i), parsed)
+        for col, parsed in filters.items()
+    )]
+
+
+def filter_mask(column, parsed):
+    op, text = parsed
+    nulls = column.null_mask()
+
+    if op == 'null':
+        return nulls
+
+    if op == 'not null':
+        return ~nulls
+
+    if op in comparisons:
+        target = comparison_target(column, text)
+        if target is not None:
+            return comparisons[op](column.numpy(), target) & ~nulls
+
+    if op in ('like', 'regexp') and column.kind in (Column.kind_str, Column.kind_bytes):
+        values = (column.decode(i) for i in range(len(column)))
+        if column.kind == Column.kind_bytes:
+            values = (value.decode('utf-8', 'replace') for value in values)
+
+        if op == 'like':
+            text = text.lower()
+            matches = (text in value.lower() for value in values)
+        else:
+            search = compile_regexp(text).search
+            matches = (search(value) is not None for value in values)
+
+        return numpy.fromiter(matches, dtype=bool, count=len(column)) & ~nulls
+
+    return numpy.fromiter(
+        (filter_matches(column.value(i), parsed) for i in range(len(column))),
+        dtype=bool,
+        count=len(column)
+    )
+
+
+def comparison_target(column, text):
+    """The filter's value as it is kept in the column's array,
+    None if the column has no array or the value doesn't fit it"""
+    try:
+        if column.kind in (Column.kind_int, Column.kind_float):
+            return float(text)
+
+        if column.kind == Column.kind_date:
+            return date.fromisoformat(text).toordinal()
+
+        if column.kind == Column.kind_datetime:
+            return (datetime.fromisoformat(text) - epoch) // microsecond
+    except ValueError:
+        return None
+
+    return None
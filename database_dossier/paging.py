@@ -0,0 +1,305 @@
+"""
+    Database Dossier - A User Interface for your databases
+    Copyright (C) 2023  Nicholas Shiell
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+
+import re
+from .quoting import quote_identifier, sql_literal, format_timedelta
+
+
+def key_columns(key_rows):
+    """
+    The columns to page on from the rows of SHOW KEYS, the primary key
+    or failing that the shortest unique index over columns that can't be
+    null and aren't prefixes. An empty list if there isn't one
+    """
+    indexes = {}
+    usable = {}
+    for row in key_rows:
+        non_unique, key_name, seq, column_name, sub_part, null = (
+            row[1], row[2], row[3], row[4], row[7], row[9]
+        )
+
+        if isinstance(key_name, (bytes, bytearray)):
+            key_name = key_name.decode('utf-8')
+            column_name = column_name.decode('utf-8')
+            null = null.decode('utf-8') if null else null
+
+        indexes.setdefault(key_name, []).append((int(seq), column_name))
+        usable[key_name] = usable.get(key_name, True) and (
+            int(non_unique) == 0 and sub_part is None and null != 'YES'
+        )
+
+    candidates = [name for name in indexes if usable[name]]
+    if not candidates:
+        return []
+
+    if 'PRIMARY' in candidates:
+        name = 'PRIMARY'
+    else:
+        name = min(candidates, key=lambda name: len(indexes[name]))
+
+    return [column for seq, column in sorted(indexes[name])]
+
+
+def long_columns(headers, rows):
+    """
+    (every column, the long text and binary ones) from DESCRIBE,
+    TINYTEXT and TINYBLOB are short enough to read whole
+    """
+    if not headers or list(headers[:2]) != ['Field', 'Type']:
+        return (None, set())
+
+    columns = []
+    long = set()
+    for row in rows:
+        name, column_type = [value.decode('utf-8')
+            if isinstance(value, (bytes, bytearray)) else value for value in row[:2]]
+
+        columns.append(name)
+        if re.match(r'(medium|long)?(text|blob)\b', column_type.lower()):
+            long.add(name)
+
+    return (columns, long)
+
+
+class KeysetPager:
+    """
+    Pages through a table by its key, each page starts after the key of
+    the last row of the page before, so page n costs the same as page 1
+    The start of each page seen is kept so going back is just as cheap
+
+    Sorting by another column orders by it then the key, and pages start
+    after both. Filters are SQL conditions ANDed into the WHERE
+
+    Tables without a usable key fall back to LIMIT / OFFSET
+
+    When "columns" are known the "prefixed" ones, long text and binary,
+    are read as their first "prefix_length" characters or bytes. Not the
+    columns paged by, as the next page starts after their whole value.
+    value_sql() reads one whole value by the key of it's row
+    """
+    prefix_length = 1024
+
+    def __init__(self, table, key, page_size=1000, order=None, filters=None):
+        self.table = table
+        self.key = key
+        self.page_size = page_size
+        self.order = order
+        self.filters = filters or []
+        self.page_no = 0
+        self.starts = [None]
+        self.last_page = None
+        self.previewing = True
+        self.columns = None
+        self.prefixed = set()
+
+
+    @property
+    def is_keyset(self):
+        return bool(self.key)
+
+
+    @property
+    def order_by(self):
+        """(column, descending) pairs, the sort column then the key"""
+        columns = []
+        descending = False
+        if self.order:
+            columns.append(self.order)
+            descending = self.order[1]
+
+        return columns + [(column, descending) for column in self.key
+            if not self.order or column != self.order[0]]
+
+
+    def sql(self, page_no):
+        conditions = list(self.filters)
+        if self.is_keyset and self.starts[page_no] is not None:
+            conditions.append(self.after(self.starts[page_no]))
+
+        sql = 'SELECT %s FROM %s' % (self.select_list(), self.table)
+        if conditions:
+            sql+= ' WHERE ' + ' AND '.join('(%s)' % c for c in conditions)
+
+        if self.order_by:
+            sql+= ' ORDER BY ' + ', '.join(
+                quote_identifier(column) + (' DESC' if descending else '')
+                for column, descending in self.order_by
+            )
+
+        sql+= ' LIMIT %d' % self.page_size
+
+        if not self.is_keyset:
+            sql+= ' OFFSET %d' % (page_no * self.page_size)
+
+        return sql
+
+
+    def select_list(self):
+        paged = set(column for column, descending in self.order_by)
+        if not self.columns or not self.prefixed - paged:
+            return '*'
+
+        return ', '.join(
+            'LEFT(%s, %d) AS %s' % (
+                quote_identifier(column),
+                self.prefix_length,
+                quote_identifier(column)
+            ) if column in self.prefixed and column not in paged
+                else quote_identifier(column)
+            for column in self.columns
+        )
+
+
+    def is_prefix(self, column, value):
+        """Whether a value read may be only the start of it"""
+        return (
+            column in self.prefixed and
+            isinstance(value, (str, bytes, bytearray)) and
+            len(value) >= self.prefix_length
+        )
+
+
+    def value_sql(self, column, key_values):
+        """key_values are the values of the key columns of the row"""
+        conditions = [
+            '%s IS NULL' % quote_identifier(name) if value is None
+                else '%s = %s' % (quote_identifier(name), sql_literal(value))
+            for name, value in zip(self.key, key_values)
+        ]
+
+        return 'SELECT %s FROM %s WHERE %s LIMIT 1' % (
+            quote_identifier(column),
+            self.table,
+            ' AND '.join(conditions)
+        )
+
+
+    def export_sql(self):
+        """The whole table, as it is filtered and sorted"""
+        sql = 'SELECT * FROM %s' % self.table
+        if self.filters:
+            sql+= ' WHERE ' + ' AND '.join('(%s)' % c for c in self.filters)
+
+        if self.order:
+            sql+= ' ORDER BY %s%s' % (
+                quote_identifier(self.order[0]),
+                ' DESC' if self.order[1] else ''
+            )
+
+        return sql
+
+
+    def after(self, values):
+        """
+        (a, b) > (1, 2) written out as a > 1 OR (a = 1 AND b > 2)
+        which every server version can turn into an index range
+        Nulls sort first, so come last when descending
+        """
+        terms = []
+        equal = []
+        for (column, descending), value in zip(self.order_by, values):
+            column = quote_identifier(column)
+
+            if value is None:
+                beyond = None if descending else '%s IS NOT NULL' % column
+                same = '%s IS NULL' % column
+            elif descending:
+                beyond = '(%s < %s OR %s IS NULL)' % (column, sql_literal(value), column)
+                same = '%s = %s' % (column, sql_literal(value))
+            else:
+                beyond = '%s > %s' % (column, sql_literal(value))
+                same = '%s = %s' % (column, sql_literal(value))
+
+            if beyond:
+                terms.append(' AND '.join(equal + [beyond]))
+
+            equal.append(same)
+
+        if len(terms) == 1:
+            return terms[0]
+
+        return ' OR '.join('(%s)' % term for term in terms)
+
+
+    def loaded(self, page_no, headers, result_set):
+        """Note where the page after this one starts, if there is one"""
+        if len(result_set) < self.page_size:
+            self.last_page = page_no
+            return None
+
+        if not self.is_keyset:
+            return None
+
+        try:
+            positions = [list(headers).index(column)
+                for column, descending in self.order_by]
+        except ValueError:
+            # The key columns aren't in the result, page by offset instead
+            self.key = []
+            return None
+
+        row = result_set[len(result_set) - 1]
+        del self.starts[page_no + 1:]
+        self.starts.append(tuple(row[i] for i in positions))
+
+
+    def in_key_order(self, headers, result_set):
+        """
+        Whether rows read without an ORDER BY came back in key order
+        and can be the first page. Only numbers and dates are trusted,
+        Python doesn't know how the server's collation orders text
+        """
+        if not self.is_keyset:
+            return True
+
+        try:
+            positions = [list(headers).index(column) for column in self.key]
+        except ValueError:
+            return False
+
+        last = None
+        for i in range(len(result_set)):
+            values = tuple(result_set.value(i, col) for col in positions)
+            for value in values:
+                if value is None or isinstance(value, (str, bytes, bytearray)):
+                    return False
+
+            if last is not None and not last < values:
+                return False
+
+            last = values
+
+        return True
+
+
+    def has_next(self, page_no=None):
+        if page_no is None:
+            page_no = self.page_no
+
+        if self.last_page is not None and page_no >= self.last_page:
+            return False
+
+        return not self.is_keyset or len(self.starts) > page_no + 1
+
+
+    def has_previous(self):
+        return self.page_no > 0
+
+
+    def first_row(self):
+        return self.page_no * self.page_size + 1
@@ -0,0 +1,270 @@
+"""
+    Database Dossier - A User Interface for your databases
+    Copyright (C) 2023  Nicholas Shiell
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+
+import time, threading
+from contextlib import contextmanager
+import mysql.connector
+from .quoting import quote_identifier
+
+
+class PooledConnection:
+    """
+    A mysql connection and the database it is using, "pool" is None
+    for a connection of it's own that is closed rather than given back
+    """
+    def __init__(self, db, pool=None):
+        self.db = db
+        self.pool = pool
+        self.database = None
+        self.pinned = False
+        self.last_used = time.perf_counter()
+        self.round_trip = 0.0
+
+
+    def ping(self, attempts=1, delay=0):
+        """
+        A round trip with no work on the server. If the connection was lost,
+        a server restart say, it is opened again with the same settings,
+        that being a new session the database has to be picked again
+        """
+        connection_id = self.db.connection_id
+        started = time.perf_counter()
+        self.db.ping(reconnect=True, attempts=attempts, delay=delay)
+        self.last_used = time.perf_counter()
+        self.round_trip = self.last_used - started
+
+        if self.db.connection_id != connection_id:
+            self.database = None
+
+
+    def use(self, database):
+        if database and database != self.database:
+            cursor = self.db.cursor()
+            cursor.execute('USE %s' % quote_identifier(database))
+            cursor.close()
+            self.database = database
+
+
+    def close(self):
+        try:
+            self.db.close()
+        except mysql.connector.errors.Error:
+            pass
+
+
+class ConnectionPool:
+    """
+    The connections to one server, opened as they're needed and kept
+    for the next one to need one
+
+    A connection is pinged when it's taken if it has been idle for more
+    than "ping_seconds", so one the server has dropped, or that was open
+    when it restarted, is reconnected rather than failing the query.
+    Idle connections over "min_size" are closed after "idle_seconds"
+
+    Short pieces of work, listing tables, drawing the diagram or the
+    executor's internal jobs, borrow one and give it back straight away,
+    at most "max_size" are lent at once, any more wait "wait_seconds" for
+    one to be given back. A tab's session takes one "pinned" so variables
+    & temporary tables set in the tab stay there between statements,
+    those are counted apart so a tab never waits on a borrowed one, at
+    most "max_pinned" at once, and are given back once the tab has run
+    nothing for "idle_seconds". Pinned connections are reset when given
+    back so nothing of the tab is left for the next to take it
+    """
+    ping_seconds = 1.0
+    wait_seconds = 10.0
+    ping_attempts = 2
+    ping_delay = 0.5
+
+    def __init__(self, factory, min_size=1, max_size=4, idle_seconds=300,
+                 max_pinned=8):
+        self.factory = factory
+        self.min_size = min_size
+        self.max_size = max(1, max_size)
+        self.max_pinned = max(1, max_pinned)
+        self.idle_seconds = idle_seconds
+        self.idle = []
+        self.lent = 0
+        self.pinned = 0
+        self.closed = False
+        self.server_info = None
+        self.condition = threading.Condition()
+
+
+    @property
+    def size(self):
+        return len(self.idle) + self.lent + self.pinned
+
+
+    def fill(self):
+        """Opens connections up to "min_size", errors are left to the caller"""
+        with self.condition:
+            missing = self.min_size - self.size
+
+        for i in range(missing):
+            pooled = self.open()
+            with self.condition:
+                self.idle.append(pooled)
+                self.condition.notify()
+
+
+    def open(self):
+        pooled = PooledConnection(self.factory(), self)
+        if self.server_info is None:
+            self.server_info = pooled.db.get_server_info()
+
+        return pooled
+
+
+    def checkout(self, pinned=False):
+        deadline = time.perf_counter() + self.wait_seconds
+        with self.condition:
+            if self.closed:
+                raise mysql.connector.errors.PoolError('The connection is closed')
+
+            while not self.available(pinned):
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0 and pinned:
+                    raise mysql.connector.errors.PoolError(
+                        'All %d tab connections are busy' % self.max_pinned
+                    )
+                elif remaining <= 0:
+                    raise mysql.connector.errors.PoolError(
+                        'All %d connections are busy' % self.max_size
+                    )
+                self.condition.wait(remaining)
+
+            expired = self.expired()
+            # The most recently used is the least likely to have been dropped
+            pooled = self.idle.pop() if self.idle else None
+            self.count(pinned, 1)
+
+        for old in expired:
+            old.close()
+
+        try:
+            if pooled is None:
+                pooled = self.open()
+            else:
+                self.check(pooled)
+        except BaseException:
+            if pooled is not None:
+                pooled.close()
+            self.release(pinned)
+            raise
+
+        pooled.pinned = pinned
+
+        return pooled
+
+
+    def available(self, pinned):
+        if pinned:
+            return self.pinned < self.max_pinned
+
+        return self.idle or self.lent < self.max_size
+
+
+    def check(self, pooled):
+        if time.perf_counter() - pooled.last_used > self.ping_seconds:
+            pooled.ping(self.ping_attempts, self.ping_delay)
+
+
+    def checkin(self, pooled):
+        pinned = pooled.pinned
+        pooled.pinned = False
+
+        try:
+            if pinned:
+                pooled.db.reset_session()
+                pooled.db.autocommit = True
+            keep = not self.closed and pooled.db.is_connected()
+        except mysql.connector.errors.Error:
+            keep = False
+
+        if keep:
+            pooled.last_used = time.perf_counter()
+            with self.condition:
+                expired = self.expired()
+                self.idle.append(pooled)
+                self.count(pinned, -1)
+                self.condition.notify_all()
+
+            for old in expired:
+                old.close()
+        else:
+            pooled.close()
+            self.release(pinned)
+
+
+    def release(self, pinned):
+        with self.condition:
+            self.count(pinned, -1)
+            self.condition.notify_all()
+
+
+    def count(self, pinned, change):
+        if pinned:
+            self.pinned = max(0, self.pinned + change)
+        else:
+            self.lent = max(0, self.lent + change)
+
+
+    def expired(self):
+        """Idle connections over "min_size" to be closed, the oldest first"""
+        expired = []
+        now = time.perf_counter()
+        while len(self.idle) > self.min_size:
+            if now - self.idle[0].last_used < self.idle_seconds:
+                break
+
+            expired.append(self.idle.pop(0))
+
+        return expired
+
+
+    @contextmanager
+    def connection(self, database=None):
+        pooled = self.checkout()
+        try:
+            pooled.use(database)
+            yield pooled
+        except mysql.connector.errors.Error:
+            # Whatever went wrong the session may be left in a state
+            # the next to take it wouldn't expect
+            pooled.close()
+            self.release(False)
+            raise
+        except BaseException:
+            self.checkin(pooled)
+            raise
+        else:
+            self.checkin(pooled)
+
+
+    def close(self):
+        """Connections lent out are closed when they're given back"""
+        with self.condition:
+            self.closed = True
+            idle = self.idle
+            self.idle = []
+            self.condition.notify_all()
+
+        for pooled in idle:
+            pooled.close()
@@ -0,0 +1,295 @@
+"""
+    Database Dossier - A User Interface for your databases
+    Copyright (C) 2023  Nicholas Shiell
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+
+import math
+from collections import Counter
+from numbers import Number
+from .result_set import numpy
+from .export import text_value
+from .diff import hashable
+
+
+mask64 = (1 << 64) - 1
+
+
+def mix(h):
+    """Spreads the bits of a hash (Python's hash of an int is the int)"""
+    h&= mask64
+    h = ((h ^ (h >> 30)) * 0xbf58476d1ce4e5b9) & mask64
+    h = ((h ^ (h >> 27)) * 0x94d049bb133111eb) & mask64
+    return h ^ (h >> 31)
+
+
+def mix_array(hashes):
+    """mix() for a whole NumPy array of hashes at once"""
+    h = hashes.astype('uint64')
+    h = (h ^ (h >> numpy.uint64(30))) * numpy.uint64(0xbf58476d1ce4e5b9)
+    h = (h ^ (h >> numpy.uint64(27))) * numpy.uint64(0x94d049bb133111eb)
+    return h ^ (h >> numpy.uint64(31))
+
+
+class HyperLogLog:
+    """
+    Counts distinct values in 2 ** precision bytes, however many there are,
+    to within about 1.04 / sqrt(2 ** precision), under 1% by default
+    """
+    def __init__(self, precision=14):
+        self.precision = precision
+        self.size = 1 << precision
+        self.registers = bytearray(self.size)
+        if numpy is not None:
+            self.registers = numpy.zeros(self.size, dtype='uint8')
+
+
+    def add(self, mixed):
+        """mixed is a list or NumPy array of mixed hashes"""
+        shift = 64 - self.precision
+        if numpy is not None:
+            mixed = numpy.asarray(mixed, dtype='uint64')
+            index = (mixed >> numpy.uint64(shift)).astype('int64')
+            rest = mixed & numpy.uint64((1 << shift) - 1)
+            # The position of the first set bit, frexp gives the bit length
+            bits = numpy.frexp(rest.astype('float64'))[1]
+            rank = (shift - bits + 1).astype('uint8')
+            numpy.maximum.at(self.registers, index, rank)
+            return None
+
+        registers = self.registers
+        for h in mixed:
+            i = h >> shift
+            rank = shift - (h & ((1 << shift) - 1)).bit_length() + 1
+            if rank > registers[i]:
+                registers[i] = rank
+
+
+    def count(self):
+        m = self.size
+        alpha = 0.7213 / (1 + 1.079 / m)
+        registers = [int(r) for r in self.registers]
+        estimate = alpha * m * m / sum(2.0 ** -r for r in registers)
+
+        zeros = registers.count(0)
+        if estimate <= 2.5 * m and zeros:
+            return int(round(m * math.log(m / zeros)))
+
+        return int(round(estimate))
+
+
+class CountMinSketch:
+    """
+    How often each value has been seen, in a fixed "depth" x "width"
+    table of counters. A value's count is never under, and is over by at
+    most e / width of all the values seen, most of the time
+    """
+    seeds = (0x9e3779b97f4a7c15, 0xc2b2ae3d27d4eb4f, 0x165667b19e3779f9,
+        0xd6e8feb86659fd93)
+
+    def __init__(self, width=32768):
+        self.width = width
+        self.depth = len(self.seeds)
+        self.total = 0
+        if numpy is not None:
+            self.table = numpy.zeros((self.depth, width), dtype='int32')
+        else:
+            self.table = [[0] * width for seed in self.seeds]
+
+
+    def columns(self, mixed):
+        if numpy is not None:
+            mixed = numpy.asarray(mixed, dtype='uint64')
+            return [
+                (mix_array(mixed ^ numpy.uint64(seed)) % numpy.uint64(self.width)).astype('int64')
+                for seed in self.seeds
+            ]
+
+        return [[mix(h ^ seed) % self.width for h in mixed] for seed in self.seeds]
+
+
+    @property
+    def error(self):
+        return math.e * self.total / self.width
+
+
+    def add(self, mixed, counts):
+        self.total+= sum(counts)
+        for row, cols in enumerate(self.columns(mixed)):
+            if numpy is not None:
+                numpy.add.at(self.table[row], cols, counts)
+            else:
+                table = self.table[row]
+                for col, count in zip(cols, counts):
+                    table[col]+= count
+
+
+    def counts(self, mixed):
+        rows = [
+            [self.table[row][col] for col in cols] if numpy is None
+                else self.table[row][cols]
+            for row, cols in enumerate(self.columns(mixed))
+        ]
+
+        if numpy is not None:
+            return numpy.min(rows, axis=0)
+
+        return [min(counts) for counts in zip(*rows)]
+
+
+class ColumnProfile:
+    """
+    What one column of a result holds, built up a batch of rows at a time
+    in memory that doesn't grow with the rows. The most common values are
+    those with the highest count in the sketch, of the "candidates" kept
+    """
+    def __init__(self, name, top=10):
+        self.name = name
+        self.top = top
+        self.max_candidates = top * 20
+        self.rows = 0
+        self.nulls = 0
+        self.min = None
+        self.max = None
+        self.total = 0
+        self.numbers = 0
+        self.comparable = True
+        self.distinct = HyperLogLog()
+        self.sketch = CountMinSketch()
+        self.candidates = {}
+
+
+    def add(self, values):
+        self.rows+= len(values)
+        present = [value for value in values if value is not None]
+        self.nulls+= len(values) - len(present)
+        if not present:
+            return None
+
+        self.add_range(present)
+
+        counter = Counter(map(hashable, present))
+        distinct = list(counter)
+        mixed = [mix(hash(value)) for value in distinct]
+        self.distinct.add(mixed)
+        self.sketch.add(mixed, list(counter.values()))
+        self.add_candidates(distinct, mixed)
+
+
+    def add_range(self, present):
+        if all(isinstance(value, Number) and not isinstance(value, bool)
+                for value in (present[0], present[-1])):
+            try:
+                self.total+= sum(present)
+                self.numbers+= len(present)
+            except TypeError:
+                pass
+
+        if not self.comparable:
+            return None
+
+        try:
+            low = min(present)
+            high = max(present)
+            self.min = low if self.min is None else min(self.min, low)
+            self.max = high if self.max is None else max(self.max, high)
+        except TypeError:
+            self.comparable = False
+            self.min = self.max = None
+
+
+    def add_candidates(self, distinct, mixed):
+        """The values with the highest counts so far, of the ones seen"""
+        for value, h in zip(distinct, mixed):
+            self.candidates[value] = h
+
+        if len(self.candidates) <= self.max_candidates:
+            return None
+
+        values = list(self.candidates)
+        counts = self.sketch.counts(list(self.candidates.values()))
+        keep = sorted(range(len(values)), key=lambda i: counts[i], reverse=True)
+        self.candidates = {values[i]: self.candidates[values[i]]
+            for i in keep[:self.max_candidates]}
+
+
+    def most_common(self):
+        """Counts that could be all error, as when every value is different,
+        are left out"""
+        values = list(self.candidates)
+        if not values:
+            return []
+
+        error = self.sketch.error
+        counts = self.sketch.counts(list(self.candidates.values()))
+        pairs = sorted(
+            [(value, int(count)) for value, count in zip(values, counts) if count > error],
+            key=lambda pair: pair[1],
+            reverse=True
+        )
+
+        return pairs[:self.top]
+
+
+    @property
+    def mean(self):
+        if not self.numbers or self.numbers != self.rows - self.nulls:
+            return None
+
+        return float(self.total) / self.numbers
+
+
+class Profiler:
+    """Profiles every column of a result as the rows arrive"""
+    headers = ['Column', 'Rows', 'Nulls', 'Distinct (~)', 'Min', 'Max', 'Mean',
+        'Most common (~)']
+
+    def __init__(self, headers, top=10):
+        self.columns = [ColumnProfile(name, top) for name in headers]
+        self.rows = 0
+
+
+    def add_rows(self, rows):
+        if not rows:
+            return None
+
+        self.rows+= len(rows)
+        for profile, values in zip(self.columns, zip(*rows)):
+            profile.add(values)
+
+
+    def summary(self):
+        """A row of text for each column, safe to hand to another thread"""
+        summary = []
+        for profile in self.columns:
+            mean = profile.mean
+            summary.append([
+                profile.name,
+                '{:,}'.format(profile.rows),
+                '{:,}'.format(profile.nulls),
+                '{:,}'.format(min(profile.distinct.count(), profile.rows - profile.nulls)),
+                '' if profile.min is None else short_text(profile.min),
+                '' if profile.max is None else short_text(profile.max),
+                '' if mean is None else '{:,.6g}'.format(mean),
+                ', '.join('%s (%s)' % (short_text(value), '{:,}'.format(count))
+                    for value, count in profile.most_common()),
+            ])
+
+        return summary
+
+
+def short_text(value, length=40):
+    text = str(text_value(value))
+    return text if len(text) <= length else text[:length - 1] + '…'
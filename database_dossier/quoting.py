@@ -0,0 +1,67 @@
+"""
+    Database Dossier - A User Interface for your databases
+    Copyright (C) 2023  Nicholas Shiell
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+
+from datetime import datetime, date, time, timedelta
+from decimal import Decimal
+
+
+def quote_identifier(name):
+    return '`%s`' % name.replace('`', '``')
+
+
+def sql_literal(value):
+    if value is None:
+        return 'NULL'
+
+    if isinstance(value, bool):
+        return str(int(value))
+
+    if isinstance(value, (int, Decimal)):
+        return str(value)
+
+    if isinstance(value, float):
+        return repr(value)
+
+    if isinstance(value, (bytes, bytearray)):
+        try:
+            value = bytes(value).decode('utf-8')
+        except UnicodeDecodeError:
+            return "X'%s'" % bytes(value).hex()
+
+    if isinstance(value, datetime):
+        value = value.isoformat(' ')
+    elif isinstance(value, (date, time)):
+        value = value.isoformat()
+    elif isinstance(value, timedelta):
+        value = format_timedelta(value)
+
+    return "'%s'" % str(value) \
+        .replace('\\', '\\\\') \
+        .replace("'", "\\'") \
+        .replace('\0', '\\0')
+
+
+def format_timedelta(value):
+    """As MySQL writes a TIME, which may be negative or over 24 hours"""
+    microseconds = value // timedelta(microseconds=1)
+    sign = '-' if microseconds < 0 else ''
+    seconds, microseconds = divmod(abs(microseconds), 1000000)
+    minutes, seconds = divmod(seconds, 60)
+    hours, minutes = divmod(minutes, 60)
+
+    return '%s%02d:%02d:%02d.%06d' % (sign, hours, minutes, seconds, microseconds)
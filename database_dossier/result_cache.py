@@ -0,0 +1,132 @@
+"""
+    Database Dossier - A User Interface for your databases
+    Copyright (C) 2023  Nicholas Shiell
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+
+import re, time
+from collections import OrderedDict
+
+
+read_only_starts = ('select', 'show', 'describe', 'desc', 'explain')
+
+# Results that change every time they are run, or that lock or write
+not_cacheable = re.compile(
+    r'\b(now|rand|uuid|uuid_short|sysdate|curdate|curtime|current_timestamp|'
+    r'current_date|current_time|unix_timestamp|utc_timestamp|connection_id|'
+    r'last_insert_id|found_rows|row_count|sleep|get_lock|release_lock)\s*\(|'
+    r'\bfor\s+update\b|\block\s+in\s+share\s+mode\b|\bfor\s+share\b|'
+    r'\binto\s+(outfile|dumpfile|@)',
+    re.IGNORECASE
+)
+
+
+def normalise_sql(sql):
+    """Whitespace outside of quotes is squashed, trailing ';' removed"""
+    parts = re.split(r'''('(?:[^'\\]|\\.)*'|"(?:[^"\\]|\\.)*"|`[^`]*`)''', sql)
+    for i in range(0, len(parts), 2):
+        parts[i] = re.sub(r'\s+', ' ', parts[i])
+
+    return ''.join(parts).strip().rstrip(';').strip()
+
+
+def first_word(sql):
+    match = re.match(r'\s*(\w+)', sql)
+    return match.group(1).lower() if match else ''
+
+
+def is_read_only(sql):
+    return first_word(sql) in read_only_starts and not not_cacheable.search(sql)
+
+
+def is_session_only(sql):
+    """Statements that don't change any data"""
+    return first_word(sql) in ('use', 'set')
+
+
+class CacheEntry:
+    def __init__(self, headers, result_set, size):
+        self.headers = headers
+        self.result_set = result_set
+        self.size = size
+        self.at = time.time()
+
+
+    @property
+    def age(self):
+        return time.time() - self.at
+
+
+class ResultCache:
+    """
+    Results of read-only statements keyed on
+    (connection, database, normalised SQL)
+    Entries older than "ttl" seconds are not used and the least recently
+    used are dropped once they add up to more than "max_bytes"
+    """
+    def __init__(self, ttl=300, max_bytes=64 * 1024 * 1024):
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()
+        self.size = 0
+
+
+    @staticmethod
+    def key(connection, database, sql):
+        return (connection, database, normalise_sql(sql))
+
+
+    def get(self, key):
+        if key not in self.entries:
+            return None
+
+        entry = self.entries[key]
+        if entry.age > self.ttl:
+            self.remove(key)
+            return None
+
+        self.entries.move_to_end(key)
+        return entry
+
+
+    def put(self, key, headers, result_set):
+        size = result_set.nbytes
+        if size > self.max_bytes:
+            return None
+
+        self.remove(key)
+        self.entries[key] = CacheEntry(headers, result_set, size)
+        self.size+= size
+
+        while self.size > self.max_bytes:
+            self.remove(next(iter(self.entries)))
+
+
+    def remove(self, key):
+        if key in self.entries:
+            self.size-= self.entries.pop(key).size
+
+
+    def invalidate(self, connection=None):
+        """Drop everything, or everything for one connection"""
+        for key in list(self.entries):
+            if connection is None or key[0] == connection:
+                self.remove(key)
+
+
+    def invalidate_for(self, connection, sql):
+        """Drop the connection's results if the SQL may have changed data"""
+        if not is_read_only(sql) and not is_session_only(sql):
+            self.invalidate(connection)
@@ -0,0 +1,479 @@
+"""
+    Database Dossier - A User Interface for your databases
+    Copyright (C) 2023  Nicholas Shiell
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+
+import sys, pickle, sqlite3
+from array import array
+from collections import OrderedDict
+from datetime import datetime, date, timedelta
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+epoch = datetime(1970, 1, 1)
+microsecond = timedelta(microseconds=1)
+
+int_min = -(2 ** 63)
+int_max = 2 ** 63 - 1
+
+
+class Column:
+    """
+    The values of one column of a result set
+    The kind is picked from the first value that is not null:
+    * int      - array of signed 64 bit ints
+    * float    - array of doubles
+    * date     - array of day ordinals
+    * datetime - array of microseconds since 1970
+    * str      - UTF-8 in one bytearray with an array of offsets into it
+    * bytes    - as str but not decoded
+    * object   - a plain list, anything else goes here
+
+    A value that does not fit the kind turns the column into an object column
+    Nulls are kept in a bitmap, the slot in the array holds a dummy value
+    """
+    kind_none     = None
+    kind_int      = 'int'
+    kind_float    = 'float'
+    kind_date     = 'date'
+    kind_datetime = 'datetime'
+    kind_str      = 'str'
+    kind_bytes    = 'bytes'
+    kind_object   = 'object'
+
+    numpy_types = {
+        'int'      : 'int64',
+        'float'    : 'float64',
+        'date'     : 'int32',
+        'datetime' : 'int64',
+    }
+
+    def __init__(self):
+        self.kind = self.kind_none
+        self.length = 0
+        self.nulls = bytearray()
+        self.values = None
+        self.offsets = None
+
+
+    def __len__(self):
+        return self.length
+
+
+    def start(self, value):
+        if type(value) is int:
+            self.kind = self.kind_int
+            self.values = array('q')
+        elif type(value) is float:
+            self.kind = self.kind_float
+            self.values = array('d')
+        elif type(value) is datetime and value.tzinfo is None:
+            self.kind = self.kind_datetime
+            self.values = array('q')
+        elif type(value) is date:
+            self.kind = self.kind_date
+            self.values = array('i')
+        elif type(value) is str:
+            self.kind = self.kind_str
+            self.values = bytearray()
+            self.offsets = array('q', [0])
+        elif isinstance(value, (bytes, bytearray)):
+            self.kind = self.kind_bytes
+            self.values = bytearray()
+            self.offsets = array('q', [0])
+        else:
+            self.kind = self.kind_object
+            self.values = []
+
+        # Catch up on the nulls seen so far
+        for i in range(self.length):
+            self.append_placeholder()
+
+
+    def append_placeholder(self):
+        if self.offsets is not None:
+            self.offsets.append(len(self.values))
+        elif self.kind == self.kind_object:
+            self.values.append(None)
+        else:
+            self.values.append(0)
+
+
+    def encode(self, value):
+        """The value as stored in the array, None if it doesn't fit"""
+        kind = self.kind
+        if kind == self.kind_int:
+            if type(value) is int and int_min <= value <= int_max:
+                return value
+        elif kind == self.kind_float:
+            if type(value) is float:
+                return value
+        elif kind == self.kind_datetime:
+            if type(value) is datetime and value.tzinfo is None:
+                return (value - epoch) // microsecond
+        elif kind == self.kind_date:
+            if type(value) is date:
+                return value.toordinal()
+        elif kind == self.kind_str:
+            if type(value) is str:
+                return value.encode('utf-8')
+        elif kind == self.kind_bytes:
+            if isinstance(value, (bytes, bytearray)):
+                return value
+
+        return None
+
+
+    def decode(self, i):
+        kind = self.kind
+        if self.offsets is not None:
+            chunk = bytes(self.values[self.offsets[i]:self.offsets[i + 1]])
+            if kind == self.kind_str:
+                return chunk.decode('utf-8')
+            return chunk
+
+        value = self.values[i]
+        if kind == self.kind_datetime:
+            return epoch + value * microsecond
+        if kind == self.kind_date:
+            return date.fromordinal(value)
+
+        return value
+
+
+    def to_objects(self):
+        """Give up on a typed array and keep the values as they are"""
+        values = [self.value(i) for i in range(self.length)]
+        self.kind = self.kind_object
+        self.values = values
+        self.offsets = None
+
+
+    def append(self, value):
+        if value is None:
+            self.set_null(self.length, True)
+            if self.kind is not self.kind_none:
+                self.append_placeholder()
+            self.length+= 1
+            return None
+
+        if self.kind is self.kind_none:
+            self.start(value)
+
+        self.set_null(self.length, False)
+
+        if self.kind != self.kind_object:
+            encoded = self.encode(value)
+            if encoded is None:
+                self.to_objects()
+
+        if self.kind == self.kind_object:
+            self.values.append(value)
+        elif self.offsets is not None:
+            self.values.extend(encoded)
+            self.offsets.append(len(self.values))
+        else:
+            self.values.append(encoded)
+
+        self.length+= 1
+
+
+    def set_null(self, i, is_null):
+        byte = i >> 3
+        if byte >= len(self.nulls):
+            self.nulls.append(0)
+
+        if is_null:
+            self.nulls[byte]|= 1 << (i & 7)
+
+
+    def is_null(self, i):
+        return bool(self.nulls[i >> 3] & (1 << (i & 7)))
+
+
+    def value(self, i):
+        if self.is_null(i):
+            return None
+
+        return self.decode(i)
+
+
+    def numpy(self):
+        """
+        The column as a NumPy array without copying, None for columns that
+        can't be (or when NumPy is not installed), see also null_mask()
+        """
+        if numpy is None or self.kind not in self.numpy_types:
+            return None
+
+        return numpy.frombuffer(self.values, dtype=self.numpy_types[self.kind])
+
+
+    def null_mask(self):
+        if numpy is None:
+            return None
+
+        bits = numpy.unpackbits(
+            numpy.frombuffer(bytes(self.nulls), dtype='uint8'),
+            bitorder='little'
+        )
+
+        return bits[:self.length].astype(bool)
+
+
+    @property
+    def nbytes(self):
+        size = len(self.nulls)
+        if self.kind == self.kind_object:
+            size+= sys.getsizeof(self.values)
+            size+= sum(sys.getsizeof(v) for v in self.values)
+        elif self.values is not None:
+            size+= len(self.values) * getattr(self.values, 'itemsize', 1)
+
+        if self.offsets is not None:
+            size+= len(self.offsets) * self.offsets.itemsize
+
+        return size
+
+
+class ColumnarResultSet:
+    """
+    Rows of a result set kept column by column
+    so that numbers, dates and text are not each a boxed Python object
+    """
+    def __init__(self, column_count, rows=None):
+        self.columns = [Column() for i in range(column_count)]
+        self.length = 0
+        if rows:
+            self.extend(rows)
+
+
+    def __len__(self):
+        return self.length
+
+
+    def __getitem__(self, row):
+        return tuple(column.value(row) for column in self.columns)
+
+
+    def extend(self, rows):
+        columns = self.columns
+        for row in rows:
+            for column, value in zip(columns, row):
+                column.append(value)
+
+        self.length+= len(rows)
+
+
+    def value(self, row, col):
+        return self.columns[col].value(row)
+
+
+    def is_null(self, row, col):
+        return self.columns[col].is_null(row)
+
+
+    def rows(self, start=0, end=None):
+        if end is None:
+            end = self.length
+
+        return [self[i] for i in range(start, end)]
+
+
+    def close(self):
+        pass
+
+
+    def column(self, col):
+        return self.columns[col]
+
+
+    @property
+    def nbytes(self):
+        return sum(column.nbytes for column in self.columns)
+
+
+class DiskResultSet:
+    """
+    Rows of a result set too big to keep in memory
+    Full pages of rows are pickled into a temporary SQLite database
+    and read back when they are needed, the most recently used
+    "hot_pages" are kept in memory as ColumnarResultSets
+
+    Whole columns, for sorting and filtering, are read with
+    load_columns() a page at a time in order, and kept in "loaded"
+    until more rows are added
+    """
+    page_size = 1000
+    hot_pages = 8
+
+    def __init__(self, column_count, rows=None):
+        self.column_count = column_count
+        self.length = 0
+        self.page_count = 0
+        self.pages = OrderedDict()
+        self.loaded = {}
+
+        # An empty file name is a private on-disk database
+        # that SQLite deletes when it is closed
+        self.db = sqlite3.connect('')
+        self.db.execute('CREATE TABLE pages (id INTEGER PRIMARY KEY, data BLOB)')
+
+        self.tail = ColumnarResultSet(column_count)
+        if rows:
+            self.extend(rows)
+
+
+    @classmethod
+    def from_result_set(cls, result_set):
+        disk = cls(len(result_set.columns))
+        for start in range(0, len(result_set), cls.page_size):
+            disk.extend(result_set.rows(start, start + cls.page_size))
+
+        return disk
+
+
+    def __len__(self):
+        return self.length
+
+
+    def __getitem__(self, row):
+        page, i = self.locate(row)
+        return page[i]
+
+
+    @property
+    def columns(self):
+        """Columns of the page being filled, they have the same kinds"""
+        return self.tail.columns
+
+
+    def extend(self, rows):
+        self.loaded = {}
+        start = 0
+        while start < len(rows):
+            room = self.page_size - len(self.tail)
+            self.tail.extend(rows[start:start + room])
+            start+= room
+
+            if len(self.tail) == self.page_size:
+                self.flush()
+
+        self.length+= len(rows)
+
+
+    def flush(self):
+        self.db.execute(
+            'INSERT INTO pages (id, data) VALUES (?, ?)',
+            (self.page_count, pickle.dumps(self.tail.rows(), pickle.HIGHEST_PROTOCOL))
+        )
+        self.remember(self.page_count, self.tail)
+        self.page_count+= 1
+        self.tail = ColumnarResultSet(self.column_count)
+
+
+    def remember(self, page_no, page):
+        self.pages[page_no] = page
+        self.pages.move_to_end(page_no)
+        while len(self.pages) > self.hot_pages:
+            self.pages.popitem(last=False)
+
+
+    def page(self, page_no):
+        if page_no == self.page_count:
+            return self.tail
+
+        if page_no in self.pages:
+            self.pages.move_to_end(page_no)
+            return self.pages[page_no]
+
+        data = self.db.execute(
+            'SELECT data FROM pages WHERE id = ?',
+            (page_no,)
+        ).fetchone()[0]
+
+        page = ColumnarResultSet(self.column_count, pickle.loads(data))
+        self.remember(page_no, page)
+
+        return page
+
+
+    def locate(self, row):
+        return (self.page(row // self.page_size), row % self.page_size)
+
+
+    def value(self, row, col):
+        page, i = self.locate(row)
+        return page.value(i, col)
+
+
+    def is_null(self, row, col):
+        page, i = self.locate(row)
+        return page.is_null(i, col)
+
+
+    def rows(self, start=0, end=None):
+        if end is None:
+            end = self.length
+
+        return [self[i] for i in range(start, end)]
+
+
+    def column(self, col):
+        return self.load_columns([col])[col]
+
+
+    def load_columns(self, cols):
+        """{column number: Column} holding every row of those columns"""
+        missing = [col for col in cols if col not in self.loaded]
+        if missing:
+            columns = {col: Column() for col in missing}
+            for page in self.page_rows():
+                for row in page:
+                    for col in missing:
+                        columns[col].append(row[col])
+
+            self.loaded.update(columns)
+
+        return {col: self.loaded[col] for col in cols}
+
+
+    def page_rows(self):
+        """The rows of each page in order, the pages on disk are unpickled
+        as they're read rather than going through the hot pages"""
+        for (data,) in self.db.execute('SELECT data FROM pages ORDER BY id'):
+            yield pickle.loads(data)
+
+        yield self.tail.rows()
+
+
+    def close(self):
+        self.db.close()
+        self.pages.clear()
+        self.loaded = {}
+
+
+    @property
+    def nbytes(self):
+        return (
+            sum(page.nbytes for page in self.pages.values()) +
+            sum(column.nbytes for column in self.loaded.values()) +
+            self.tail.nbytes
+        )
@@ -23,6 +23,7 @@ from os import path
 dirs = AppDirs('database-dossier', 'nshiell')
 
 user_config_file_path = os.path.join(dirs.user_config_dir, 'config.json')
+history_path = os.path.join(dirs.user_data_dir, 'history.sqlite')
 
 def make_config_dir_if_not_exists():
     if not os.path.exists(dirs.user_config_dir):
@@ -110,6 +111,24 @@ class State:
         self.sql_path = os.path.join(dirs.user_data_dir, 'editor.sql')
         self.connections = []
         self.active_connection_index = None
+        self.large_result_mode = False
+        self.result_memory_limit_mb = 256
+        self.script_continue_on_error = False
+        self.result_cache = False
+        self.client_side_results = True
+        self.import_load_data = True
+        self.import_chunk_size = 1000
+        self.import_disable_checks = False
+        self.limit_guard = False
+        self.limit_guard_ask = True
+        self.limit_guard_rows = 100000
+        self.limit_guard_limit = 1000
+        self.result_cache_ttl = 300
+        self.result_cache_mb = 64
+        self.pool_min_size = 1
+        self.pool_max_size = 4
+        self.pool_idle_seconds = 300
+        self.pool_max_pinned = 8
 
         if isinstance(data, dict):
             if valid(data, 'connections', list, 0, 50):
@@ -129,6 +148,60 @@ class State:
             if active_connection_index_valid:
                 self.active_connection_index = data['active_connection_index']
 
+            if valid(data, 'large_result_mode', bool):
+                self.large_result_mode = data['large_result_mode']
+
+            if valid(data, 'result_memory_limit_mb', int, 1, 100000):
+                self.result_memory_limit_mb = data['result_memory_limit_mb']
+
+            if valid(data, 'script_continue_on_error', bool):
+                self.script_continue_on_error = data['script_continue_on_error']
+
+            if valid(data, 'result_cache', bool):
+                self.result_cache = data['result_cache']
+
+            if valid(data, 'client_side_results', bool):
+                self.client_side_results = data['client_side_results']
+
+            if valid(data, 'import_load_data', bool):
+                self.import_load_data = data['import_load_data']
+
+            if valid(data, 'import_chunk_size', int, 1, 100000):
+                self.import_chunk_size = data['import_chunk_size']
+
+            if valid(data, 'import_disable_checks', bool):
+                self.import_disable_checks = data['import_disable_checks']
+
+            if valid(data, 'limit_guard', bool):
+                self.limit_guard = data['limit_guard']
+
+            if valid(data, 'limit_guard_ask', bool):
+                self.limit_guard_ask = data['limit_guard_ask']
+
+            if valid(data, 'limit_guard_rows', int, 1, 1000000000):
+                self.limit_guard_rows = data['limit_guard_rows']
+
+            if valid(data, 'limit_guard_limit', int, 1, 10000000):
+                self.limit_guard_limit = data['limit_guard_limit']
+
+            if valid(data, 'result_cache_ttl', int, 1, 86400):
+                self.result_cache_ttl = data['result_cache_ttl']
+
+            if valid(data, 'result_cache_mb', int, 1, 100000):
+                self.result_cache_mb = data['result_cache_mb']
+
+            if valid(data, 'pool_min_size', int, 0, 20):
+                self.pool_min_size = data['pool_min_size']
+
+            if valid(data, 'pool_max_size', int, 1, 50):
+                self.pool_max_size = data['pool_max_size']
+
+            if valid(data, 'pool_idle_seconds', int, 1, 86400):
+                self.pool_idle_seconds = data['pool_idle_seconds']
+
+            if valid(data, 'pool_max_pinned', int, 1, 50):
+                self.pool_max_pinned = data['pool_max_pinned']
+
             if 'sql_path' in data and data['sql_path'] is str:
                 self.sql_path = data['sql_path']
             else:
@@ -161,7 +234,25 @@ class State:
             "version": '0.0.1',
             "connections": self.connections_for_persist(),
             "sql_path": self.sql_path,
-            "active_connection_index": self.active_connection_index
+            "active_connection_index": self.active_connection_index,
+            "large_result_mode": self.large_result_mode,
+            "result_memory_limit_mb": self.result_memory_limit_mb,
+            "script_continue_on_error": self.script_continue_on_error,
+            "result_cache": self.result_cache,
+            "result_cache_ttl": self.result_cache_ttl,
+            "result_cache_mb": self.result_cache_mb,
+            "client_side_results": self.client_side_results,
+            "import_load_data": self.import_load_data,
+            "import_chunk_size": self.import_chunk_size,
+            "import_disable_checks": self.import_disable_checks,
+            "limit_guard": self.limit_guard,
+            "limit_guard_ask": self.limit_guard_ask,
+            "limit_guard_rows": self.limit_guard_rows,
+            "limit_guard_limit": self.limit_guard_limit,
+            "pool_min_size": self.pool_min_size,
+            "pool_max_size": self.pool_max_size,
+            "pool_idle_seconds": self.pool_idle_seconds,
+            "pool_max_pinned": self.pool_max_pinned
         }
 
 
@@ -0,0 +1,153 @@
+"""
+    Database Dossier - A User Interface for your databases
+    Copyright (C) 2023  Nicholas Shiell
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+
+import time
+
+
+class Timing:
+    """
+    Where the time went when running one statement
+
+    The client can't see inside a round trip, so "send" is taken as half
+    of the session's last ping and "server" is the rest of the time
+    execute() took, less a whole ping
+
+    "first_row" is a marker rather than a step, the time from the session
+    starting on the statement to the first rows being fetched, so it
+    overlaps the steps before it and isn't part of the total
+    """
+    steps = (
+        ('queue',     'Queued'),
+        ('connect',   'Connect'),
+        ('send',      'Send'),
+        ('server',    'Server'),
+        ('first_row', 'First row'),
+        ('fetch',     'Fetch'),
+        ('model',     'Model'),
+        ('paint',     'First paint'),
+    )
+    markers = ('first_row',)
+
+    def __init__(self, name, sql, connection=None, database=None):
+        self.name = name
+        self.sql = sql
+        self.connection = connection
+        self.database = database
+        self.at = time.time()
+        self.seconds = {step: 0.0 for step, label in self.steps}
+        self.rows = 0
+        self.bytes = 0
+        self.error = None
+
+
+    def add(self, step, seconds):
+        self.seconds[step]+= seconds
+
+
+    @property
+    def total(self):
+        return sum(seconds for step, seconds in self.seconds.items()
+            if step not in self.markers)
+
+
+    def summary(self):
+        return '%d rows, %s, %s' % (
+            self.rows,
+            format_bytes(self.bytes),
+            format_seconds(self.total)
+        )
+
+
+    def describe(self):
+        lines = ['%s: %s' % (label, format_seconds(self.seconds[step]))
+            for step, label in self.steps]
+        lines.append('Rows: %d' % self.rows)
+        lines.append('Bytes: ~%s' % format_bytes(self.bytes))
+
+        if self.error:
+            lines.append('Error: %s' % self.error)
+
+        return '\n'.join(lines)
+
+
+class TimingHistory(list):
+    """The timings of the statements run this session, newest last"""
+    def __init__(self, limit=10000):
+        self.limit = limit
+
+
+    def add(self, timing):
+        self.append(timing)
+        if len(self) > self.limit:
+            del self[0]
+
+
+    def find(self, name=None, sql=None, connection=None, database=None,
+            slower_than=None, errors=None):
+        found = TimingHistory(self.limit)
+        for timing in self:
+            if name is not None and timing.name != name:
+                continue
+
+            if sql is not None and sql.lower() not in timing.sql.lower():
+                continue
+
+            if connection is not None and timing.connection != connection:
+                continue
+
+            if database is not None and timing.database != database:
+                continue
+
+            if slower_than is not None and timing.total < slower_than:
+                continue
+
+            if errors is not None and bool(timing.error) != errors:
+                continue
+
+            found.append(timing)
+
+        return found
+
+
+    def slowest(self, count=10):
+        return sorted(self, key=lambda timing: timing.total, reverse=True)[:count]
+
+
+def format_seconds(seconds):
+    if seconds < 1:
+        return '%.1f ms' % (seconds * 1000)
+
+    return '%.2f s' % seconds
+
+
+def format_count(count):
+    for unit in ['', 'K', 'M']:
+        if count < 1000:
+            return ('%d%s' if unit == '' else '%.1f%s') % (count, unit)
+        count/= 1000
+
+    return '%.1fB' % count
+
+
+def format_bytes(size):
+    for unit in ['B', 'KB', 'MB']:
+        if size < 1024:
+            return '%d %s' % (size, unit)
+        size/= 1024
+
+    return '%.1f GB' % size
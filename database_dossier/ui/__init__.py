@@ -16,13 +16,15 @@
     along with this program.  If not, see <https://www.gnu.org/licenses/>.
 """
 
-import os, json, webbrowser
+import os, json, time, webbrowser
 from PyQt5.QtWidgets import *
 from PyQt5.Qt import *
 from PyQt5.QtGui import *
 from PyQt5.QtCore import *
 
 from .types import *
+from .. import explain, profiling
+from ..timings import format_seconds, format_bytes
 
 
 def load_web_engine_if_needed():
@@ -277,4 +279,547 @@ class ConnectionDialog(QDialog, WindowMixin):
         self.user.setText('')
         self.password.setText('')
 
-        super().show()
\ No newline at end of file
+        super().show()
+
+class PlanDialog(QDialog, WindowMixin):
+    """
+    Shows the plan from EXPLAIN FORMAT=JSON as a tree,
+    full scans and filesorts are in red
+    Analyze re-runs it with EXPLAIN ANALYZE (or ANALYZE on MariaDB)
+    which actually runs the query
+    """
+    def __init__(self, main_win, run_sql):
+        super().__init__(main_win)
+        self.run_sql = run_sql
+        self.sql = None
+        self.pool = None
+        self.load_xml('plan.ui')
+
+        self.model = QStandardItemModel()
+        self.tree_view_plan.setModel(self.model)
+
+        self.analyze.clicked.connect(self.run_analyze)
+        self.bind('button_box.Close', 'clicked', self.close)
+
+
+    def explain(self, sql, pool):
+        self.sql = sql
+        self.pool = pool
+        self.run(explain.explain_sql(sql), 'Explaining...')
+        self.show()
+
+
+    def run_analyze(self):
+        if self.sql:
+            # The pool reads the server's version with the first connection
+            # it opens, with none kept open that's the one explaining
+            self.run(
+                explain.analyze_sql(self.sql, self.pool.server_info),
+                'Analyzing...'
+            )
+
+
+    def run(self, sql, status):
+        self.label_plan_status.setText(status)
+        self.run_sql(sql, self.show_plan)
+
+
+    def show_plan(self, job):
+        self.model.clear()
+        self.model.setHorizontalHeaderLabels(explain.headers)
+
+        if job.is_error:
+            self.label_plan_status.setText(str(job.record_set[0][0]))
+            return None
+
+        text = '\n'.join(
+            row[0].decode('utf-8') if isinstance(row[0], (bytes, bytearray))
+                else str(row[0])
+            for row in job.record_set
+        )
+
+        try:
+            root = explain.parse_plan(text)
+        except ValueError as e:
+            self.label_plan_status.setText('Could not read the plan: %s' % e)
+            return None
+
+        warnings = []
+        self.add_nodes(self.model.invisibleRootItem(), root.children, warnings)
+        self.tree_view_plan.expandAll()
+
+        for i in range(len(explain.headers)):
+            self.tree_view_plan.resizeColumnToContents(i)
+
+        if warnings:
+            self.label_plan_status.setText(', '.join(sorted(set(warnings))))
+        else:
+            self.label_plan_status.setText('No full scans or filesorts')
+
+
+    def add_nodes(self, parent, nodes, warnings):
+        for node in nodes:
+            items = [QStandardItem(text) for text in node.columns]
+            for item in items:
+                item.setEditable(False)
+                if node.warning:
+                    item.setForeground(QColor(Qt.red))
+                    item.setToolTip(node.warning)
+
+            if node.warning:
+                warnings.append(node.warning)
+
+            parent.appendRow(items)
+            self.add_nodes(items[0], node.children, warnings)
+
+
+class ScriptDialog(QDialog, WindowMixin):
+    """
+    Lists the statements of a script as they are run, with the rows
+    affected, time taken and any error
+    Statements that return rows get a tab of their own for them
+    """
+    headers = ['#', 'Statement', 'Rows', 'Time', 'Status']
+    max_result_tabs = 20
+
+    def __init__(self, main_win, record_set_colors, stop):
+        super().__init__(main_win)
+        self.load_xml('script.ui')
+        self.record_set_colors = record_set_colors
+        self.result_tabs = {}
+        self.count = 0
+
+        self.statements = TableModel(record_set_colors)
+        self.table_view_statements.setModel(self.statements)
+        self.table_view_statements.clicked.connect(self.statement_clicked)
+
+        self.stop_script.clicked.connect(stop)
+        self.bind('button_box.Close', 'clicked', self.close)
+
+
+    def start(self, count):
+        self.count = count
+        self.result_tabs = {}
+        self.tab_script_results.clear()
+        self.statements.reset(self.headers, [])
+        self.stop_script.setEnabled(True)
+        self.label_script_status.setText('Running %d statements...' % count)
+        self.show()
+
+
+    def add_result(self, result):
+        status = 'OK'
+        if result.error:
+            status = result.error
+        elif result.truncated:
+            status = 'First %d rows kept' % len(result.rows)
+
+        first_line = result.sql.strip().split('\n')[0]
+        self.statements.append_rows([(
+            result.index + 1,
+            first_line[:100],
+            result.rowcount,
+            format_seconds(result.seconds),
+            status
+        )])
+
+        if result.headers and len(self.result_tabs) < self.max_result_tabs:
+            self.add_result_tab(result)
+
+        self.label_script_status.setText('%d of %d statements run' % (
+            result.index + 1,
+            self.count
+        ))
+
+
+    def add_result_tab(self, result):
+        model = TableModel(self.record_set_colors)
+        model.reset(result.headers, result.rows)
+
+        table_view = QTableView()
+        table_view.setAlternatingRowColors(True)
+        table_view.setModel(model)
+        table_view.horizontalHeader().setStretchLastSection(True)
+
+        self.result_tabs[result.index] = self.tab_script_results.addTab(
+            table_view,
+            str(result.index + 1)
+        )
+
+
+    def statement_clicked(self, model_index):
+        if model_index.row() in self.result_tabs:
+            self.tab_script_results.setCurrentIndex(
+                self.result_tabs[model_index.row()]
+            )
+
+
+    def finish(self, job):
+        self.stop_script.setEnabled(False)
+
+        run = len(self.statements.record_set)
+        text = '%d of %d statements run, %d failed' % (run, self.count, job.errors)
+        if job.cancelled:
+            text+= ', stopped'
+
+        self.label_script_status.setText(text)
+
+
+class ExportDialog(QDialog, WindowMixin):
+    """Progress of an export to a file, the rows and bytes written so far
+    and how fast they are going"""
+    def __init__(self, main_win, cancel):
+        super().__init__(main_win)
+        self.load_xml('export.ui')
+        self.started = 0.0
+
+        self.cancel_export.clicked.connect(cancel)
+        self.bind('button_box.Close', 'clicked', self.close)
+
+
+    def start(self, path):
+        self.started = time.perf_counter()
+        self.label_export_file.setText('Exporting to %s' % path)
+        self.label_export_status.setText('Running the query...')
+        self.progress_export.setMaximum(0)
+        self.cancel_export.setEnabled(True)
+        self.show()
+
+
+    def progress(self, job):
+        seconds = max(time.perf_counter() - self.started, 0.001)
+        self.label_export_status.setText('%s rows, %s in %s (%s/s, %s rows/s)' % (
+            '{:,}'.format(job.rows),
+            format_bytes(job.bytes),
+            format_seconds(seconds),
+            format_bytes(job.bytes / seconds),
+            '{:,}'.format(int(job.rows / seconds))
+        ))
+
+
+    def finish(self, job):
+        self.cancel_export.setEnabled(False)
+        self.progress_export.setMaximum(1)
+        self.progress_export.setValue(1)
+        self.progress(job)
+
+        status = self.label_export_status.text()
+        if job.cancelled:
+            status = 'Cancelled, the file has the first %s' % status
+        elif job.is_error:
+            status = 'Failed: %s' % job.record_set[0][0]
+        else:
+            status = 'Done, %s' % status
+
+        self.label_export_status.setText(status)
+
+
+class ImportDialog(QDialog, WindowMixin):
+    """
+    The options for loading a CSV file into a table, then the progress
+    Import calls start_import with the options picked
+    """
+    def __init__(self, main_win, start_import, cancel):
+        super().__init__(main_win)
+        self.load_xml('import.ui')
+        self.started = 0.0
+
+        self.start_import.clicked.connect(lambda: start_import(
+            self.load_data.isChecked(),
+            self.chunk_size.value(),
+            self.disable_checks.isChecked()
+        ))
+        self.cancel_import.clicked.connect(cancel)
+        self.bind('button_box.Close', 'clicked', self.close)
+
+
+    def prepare(self, path, table, load_data, chunk_size, disable_checks):
+        self.label_import_file.setText('Import %s into %s' % (path, table))
+        self.label_import_status.setText('')
+        self.load_data.setChecked(load_data)
+        self.chunk_size.setValue(chunk_size)
+        self.disable_checks.setChecked(disable_checks)
+        self.set_running(False)
+        self.progress_import.setMaximum(1)
+        self.progress_import.setValue(0)
+        self.show()
+
+
+    def set_running(self, running):
+        self.start_import.setEnabled(not running)
+        self.cancel_import.setEnabled(running)
+        for widget in [self.load_data, self.chunk_size, self.disable_checks]:
+            widget.setEnabled(not running)
+
+
+    def start(self):
+        self.started = time.perf_counter()
+        self.set_running(True)
+        self.progress_import.setMaximum(0)
+        self.label_import_status.setText('Starting...')
+
+
+    def progress(self, job):
+        seconds = max(time.perf_counter() - self.started, 0.001)
+        self.label_import_status.setText('%s: %s rows in %s (%s rows/s)' % (
+            job.method or 'Import',
+            '{:,}'.format(job.rows),
+            format_seconds(seconds),
+            '{:,}'.format(int(job.rows / seconds))
+        ))
+
+
+    def finish(self, job):
+        self.set_running(False)
+        self.start_import.setEnabled(False)
+        self.progress_import.setMaximum(1)
+        self.progress_import.setValue(1)
+        self.progress(job)
+
+        status = self.label_import_status.text()
+        if job.cancelled:
+            status = 'Cancelled, %s were committed' % status
+        elif job.is_error:
+            status = 'Failed after %s rows: %s' % (
+                '{:,}'.format(job.rows),
+                job.record_set[0][0]
+            )
+        else:
+            status = 'Done, %s' % status
+
+        self.label_import_status.setText(status)
+
+
+class DiffDialog(QDialog, WindowMixin):
+    """
+    Picks two result tabs to compare and shows the counts as they grow
+    Compare calls start_diff with the names of the tabs and the key columns
+    """
+    def __init__(self, main_win, start_diff, stop):
+        super().__init__(main_win)
+        self.load_xml('diff.ui')
+
+        self.start_diff.clicked.connect(lambda: start_diff(
+            self.diff_old.currentData(),
+            self.diff_new.currentData(),
+            self.diff_keys.text()
+        ))
+        self.stop_diff.clicked.connect(stop)
+        self.bind('button_box.Close', 'clicked', self.close)
+
+
+    def prepare(self, tabs, old_name, new_name):
+        """tabs are (name, title) pairs"""
+        for combo, selected in [(self.diff_old, old_name), (self.diff_new, new_name)]:
+            combo.clear()
+            for name, title in tabs:
+                combo.addItem(title, name)
+                if name == selected:
+                    combo.setCurrentIndex(combo.count() - 1)
+
+        self.label_diff_status.setText('')
+        self.set_running(False)
+        self.progress_diff.setMaximum(1)
+        self.progress_diff.setValue(0)
+        self.show()
+
+
+    def set_running(self, running):
+        self.start_diff.setEnabled(not running)
+        self.stop_diff.setEnabled(running)
+        for widget in [self.diff_old, self.diff_new, self.diff_keys]:
+            widget.setEnabled(not running)
+
+
+    def start(self, result_diff):
+        self.set_running(True)
+        self.progress_diff.setMaximum(max(result_diff.total, 1))
+        self.progress(result_diff)
+
+
+    def progress(self, result_diff):
+        self.progress_diff.setValue(result_diff.done)
+        self.label_diff_status.setText('%s (%s of %s rows in %s)' % (
+            result_diff.summary(),
+            '{:,}'.format(result_diff.done),
+            '{:,}'.format(result_diff.total),
+            format_seconds(result_diff.seconds)
+        ))
+
+
+    def finish(self, result_diff):
+        self.set_running(False)
+        self.progress(result_diff)
+        if result_diff.finished:
+            self.progress_diff.setValue(self.progress_diff.maximum())
+            status = 'Done, %s'
+        else:
+            status = 'Stopped, %s'
+
+        self.label_diff_status.setText(status % self.label_diff_status.text())
+
+
+    def error(self, text):
+        self.set_running(False)
+        self.label_diff_status.setText(text)
+
+
+class ProfileDialog(QDialog, WindowMixin):
+    """
+    The profile of each column of a result, filled in as the rows are read
+    Distinct values and the most common ones are estimates
+    """
+    def __init__(self, main_win, cancel):
+        super().__init__(main_win)
+        self.load_xml('profile.ui')
+        self.started = 0.0
+
+        self.model = QStandardItemModel()
+        self.table_view_profile.setModel(self.model)
+        self.table_view_profile.horizontalHeader().setStretchLastSection(True)
+        self.table_view_profile.verticalHeader().hide()
+
+        self.cancel_profile.clicked.connect(cancel)
+        self.bind('button_box.Close', 'clicked', self.close)
+
+
+    def start(self, sql):
+        self.started = time.perf_counter()
+        self.model.clear()
+        self.label_profile_sql.setText(sql)
+        self.label_profile_status.setText('Running the query...')
+        self.progress_profile.setMaximum(0)
+        self.cancel_profile.setEnabled(True)
+        self.show()
+
+
+    def progress(self, job):
+        self.model.clear()
+        self.model.setHorizontalHeaderLabels(profiling.Profiler.headers)
+        for row in job.summary:
+            items = [QStandardItem(text) for text in row]
+            for item in items[1:4] + items[6:7]:
+                item.setTextAlignment(Qt.AlignRight + Qt.AlignVCenter)
+            items[-1].setToolTip(row[-1])
+            self.model.appendRow(items)
+
+        self.table_view_profile.resizeColumnsToContents()
+
+        seconds = max(time.perf_counter() - self.started, 0.001)
+        self.label_profile_status.setText('%s rows in %s (%s rows/s)' % (
+            '{:,}'.format(job.rows),
+            format_seconds(seconds),
+            '{:,}'.format(int(job.rows / seconds))
+        ))
+
+
+    def finish(self, job):
+        self.cancel_profile.setEnabled(False)
+        self.progress_profile.setMaximum(1)
+        self.progress_profile.setValue(1)
+        self.progress(job)
+
+        status = self.label_profile_status.text()
+        if job.cancelled:
+            status = 'Cancelled, the profile is of the first %s' % status
+        elif job.is_error:
+            status = 'Failed: %s' % job.record_set[0][0]
+        else:
+            status = 'Done, %s' % status
+
+        self.label_profile_status.setText(status)
+
+
+class ValueDialog(QDialog, WindowMixin):
+    """
+    The whole of one cell's value, text as it is and binary as a hex dump
+    of at most "dump_bytes", Save writes all of it to a file as it is
+    """
+    dump_bytes = 1024 * 1024
+
+    def __init__(self, main_win):
+        super().__init__(main_win)
+        self.load_xml('value.ui')
+        self.value = None
+
+        self.value_wrap.toggled.connect(lambda checked:
+            self.text_value.setLineWrapMode(
+                QPlainTextEdit.WidgetWidth if checked else QPlainTextEdit.NoWrap
+            )
+        )
+        self.save_value.clicked.connect(self.save)
+        self.bind('button_box.Close', 'clicked', self.close)
+
+
+    def loading(self, title):
+        self.value = None
+        self.setWindowTitle('%s — Database Dossier' % title)
+        self.label_value_info.setText('Reading the whole value...')
+        self.text_value.setPlainText('')
+        self.save_value.setEnabled(False)
+        self.show()
+
+
+    def show_value(self, title, value):
+        self.value = value
+        self.setWindowTitle('%s — Database Dossier' % title)
+        self.save_value.setEnabled(value is not None)
+
+        if value is None:
+            self.label_value_info.setText('null')
+            self.text_value.setPlainText('')
+        elif isinstance(value, (bytes, bytearray)):
+            try:
+                text = bytes(value).decode('utf-8')
+                if '\x00' in text:
+                    raise ValueError()
+
+                self.label_value_info.setText('Text, %s' % format_bytes(len(value)))
+                self.text_value.setPlainText(text)
+            except ValueError:
+                self.label_value_info.setText('Binary, %s%s' % (
+                    format_bytes(len(value)),
+                    ', the first %s are shown' % format_bytes(self.dump_bytes)
+                        if len(value) > self.dump_bytes else ''
+                ))
+                self.text_value.setPlainText(hex_dump(value[:self.dump_bytes]))
+        else:
+            text = str(value)
+            self.label_value_info.setText('%s characters' % '{:,}'.format(len(text)))
+            self.text_value.setPlainText(text)
+
+        self.show()
+
+
+    def error(self, text):
+        self.label_value_info.setText(text)
+
+
+    def save(self):
+        path, file_filter = QFileDialog.getSaveFileName(self, 'Save Value')
+        if not path or self.value is None:
+            return None
+
+        value = self.value
+        if not isinstance(value, (bytes, bytearray)):
+            value = str(value).encode('utf-8')
+
+        try:
+            with open(path, 'wb') as file:
+                file.write(value)
+        except OSError as e:
+            self.label_value_info.setText(str(e))
+
+
+def hex_dump(data):
+    """Offset, 16 bytes in hex, then those that are printable"""
+    lines = []
+    for offset in range(0, len(data), 16):
+        chunk = bytes(data[offset:offset + 16])
+        lines.append('%08x  %-47s  %s' % (
+            offset,
+            chunk.hex(' '),
+            ''.join(chr(byte) if 32 <= byte < 127 else '.' for byte in chunk)
+        ))
+
+    return '\n'.join(lines)
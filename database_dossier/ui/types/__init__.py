@@ -1,5 +1,8 @@
 from .table_model import TableModel
+from .filter_header import FilterHeader
+from .filter_proxy_model import FilterProxyModel
 from .window_mixin import WindowMixin
 from .text_document import TextDocument
 from .text_editor import TextEditor
+from .log_pane import LogPane
 from .diagram import Diagram
@@ -0,0 +1,120 @@
+"""
+    Database Dossier - A User Interface for your databases
+    Copyright (C) 2023  Nicholas Shiell
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+
+from PyQt5.QtWidgets import *
+from PyQt5.QtCore import *
+from ...filters import help_text
+
+
+class FilterHeader(QHeaderView):
+    """
+    A horizontal header with a filter box under each column
+    The text of the boxes is kept by column name, so it survives the
+    model being reset with the same columns, such as the next page
+
+    "filters_changed" is emitted when return is pressed in a box
+    """
+    filters_changed = pyqtSignal()
+    padding = 4
+
+    def __init__(self, table_view):
+        super().__init__(Qt.Horizontal, table_view)
+        self.editors = []
+        self.texts = {}
+        self.filtering = True
+        self.setSectionsClickable(True)
+        self.setHighlightSections(True)
+        self.setDefaultSectionSize(table_view.horizontalHeader().defaultSectionSize())
+        self.setStretchLastSection(True)
+        self.sectionResized.connect(self.move_editors)
+        self.sectionCountChanged.connect(self.make_editors)
+        table_view.horizontalScrollBar().valueChanged.connect(self.move_editors)
+        table_view.setHorizontalHeader(self)
+
+
+    def set_filtering(self, filtering):
+        self.filtering = filtering
+        self.make_editors()
+
+
+    def make_editors(self):
+        for editor in self.editors:
+            editor.deleteLater()
+
+        self.editors = []
+        if self.filtering and self.model():
+            for col in range(self.count()):
+                editor = QLineEdit(self)
+                editor.setPlaceholderText('Filter')
+                editor.setToolTip(help_text)
+                editor.setClearButtonEnabled(True)
+                editor.setText(self.texts.get(self.column_name(col), ''))
+                editor.returnPressed.connect(self.editor_changed)
+                editor.show()
+                self.editors.append(editor)
+
+        self.updateGeometries()
+
+
+    def column_name(self, col):
+        return str(self.model().headerData(col, Qt.Horizontal, Qt.DisplayRole))
+
+
+    def editor_changed(self):
+        for col, editor in enumerate(self.editors):
+            self.texts[self.column_name(col)] = editor.text()
+
+        self.filters_changed.emit()
+
+
+    def filters(self):
+        """(column number, column name, text) of each box with something in"""
+        return [(col, self.column_name(col), editor.text())
+            for col, editor in enumerate(self.editors) if editor.text().strip()]
+
+
+    def clear_filters(self):
+        self.texts = {}
+        for editor in self.editors:
+            editor.clear()
+
+
+    def editor_height(self):
+        if not self.editors:
+            return 0
+
+        return self.editors[0].sizeHint().height() + self.padding
+
+
+    def sizeHint(self):
+        size = super().sizeHint()
+        size.setHeight(size.height() + self.editor_height())
+        return size
+
+
+    def updateGeometries(self):
+        self.setViewportMargins(0, 0, 0, self.editor_height())
+        super().updateGeometries()
+        self.move_editors()
+
+
+    def move_editors(self):
+        top = super().sizeHint().height() + self.padding // 2
+        for col, editor in enumerate(self.editors):
+            editor.move(self.sectionViewportPosition(col) + 1, top)
+            editor.resize(self.sectionSize(col) - 2, editor.sizeHint().height())
@@ -0,0 +1,227 @@
+"""
+    Database Dossier - A User Interface for your databases
+    Copyright (C) 2023  Nicholas Shiell
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+
+import time, threading
+from PyQt5.QtCore import *
+from ...filters import parse_filter
+from ...ordering import is_vectorised, load_columns, order_rows
+
+
+class FilterProxyModel(QAbstractProxyModel):
+    """
+    Sorts and filters the rows already fetched into a TableModel,
+    for results that can't be sent back to the server
+
+    Rather than Qt calling back into Python for each pair of rows,
+    the whole result set is sorted and filtered a column at a time
+    (see ordering.py) leaving "rows", the source row of each row shown.
+    "rows" is None when every row is shown in its own order
+
+    Without NumPy the rows are sorted and filtered on a thread of their
+    own, the rows shown don't change until it's done. "generation" counts
+    the changes asked for so that only the latest one is used
+
+    "timed" is emitted with what was done, the rows and the seconds taken
+    """
+    timed = pyqtSignal(str, int, float)
+    ordered = pyqtSignal(int, object, str, int, float)
+
+    def __init__(self):
+        super().__init__()
+        self.filters = {}
+        self.sort_keys = []
+        self.rows = None
+        self.source_rows = None
+        self.generation = 0
+        self.ordered.connect(self.ordered_handler)
+
+
+    def setSourceModel(self, model):
+        super().setSourceModel(model)
+        model.modelAboutToBeReset.connect(self.beginResetModel)
+        model.modelReset.connect(self.source_reset)
+        model.rowsAboutToBeInserted.connect(self.source_rows_about_to_be_inserted)
+        model.rowsInserted.connect(self.source_rows_inserted)
+        model.layoutChanged.connect(self.layoutChanged.emit)
+        model.headerDataChanged.connect(self.headerDataChanged.emit)
+
+
+    def set_filters(self, filters):
+        """filters are (column number, column name, text) from FilterHeader"""
+        self.filters = {}
+        for col, name, text in filters:
+            parsed = parse_filter(text)
+            if parsed:
+                self.filters[col] = parsed
+
+        self.beginResetModel()
+        self.update_rows()
+        self.endResetModel()
+
+
+    def sort_by(self, keys):
+        """keys are (column number, descending), most significant first"""
+        self.sort_keys = keys
+        self.beginResetModel()
+        self.update_rows()
+        self.endResetModel()
+
+
+    def update_rows(self):
+        self.generation+= 1
+
+        source = self.sourceModel()
+        if source.record_set is None or source.is_error:
+            self.set_rows(None)
+            return None
+
+        if not self.filters and not self.sort_keys:
+            self.set_rows(None)
+            return None
+
+        count = source.columnCount(QModelIndex())
+        filters = {col: f for col, f in self.filters.items() if col < count}
+        keys = [key for key in self.sort_keys if key[0] < count]
+
+        started = time.perf_counter()
+        length = len(source.record_set)
+        columns = load_columns(
+            source.record_set,
+            set(filters) | set(col for col, descending in keys)
+        )
+
+        if is_vectorised():
+            rows, done = order_rows(columns, length, filters, keys)
+            self.set_rows(rows)
+            self.timed.emit(done, length, time.perf_counter() - started)
+            return None
+
+        generation = self.generation
+        def order():
+            rows, done = order_rows(columns, length, filters, keys)
+            seconds = time.perf_counter() - started
+            self.ordered.emit(generation, rows, done, length, seconds)
+
+        threading.Thread(target=order, daemon=True).start()
+
+
+    def set_rows(self, rows):
+        self.rows = rows
+        self.source_rows = None
+
+
+    def ordered_handler(self, generation, rows, done, length, seconds):
+        if generation != self.generation:
+            return None
+
+        self.beginResetModel()
+        self.set_rows(rows)
+        self.endResetModel()
+        self.timed.emit(done, length, seconds)
+
+
+    def source_reset(self):
+        self.generation+= 1
+        self.filters = {}
+        self.sort_keys = []
+        self.rows = None
+        self.source_rows = None
+        self.endResetModel()
+
+
+    def source_rows_about_to_be_inserted(self, parent, first, last):
+        if self.rows is None:
+            self.beginInsertRows(QModelIndex(), first, last)
+
+
+    def source_rows_inserted(self, parent, first, last):
+        if self.rows is None:
+            self.endInsertRows()
+            return None
+
+        # Streamed rows may land anywhere once sorted
+        count = len(self.rows)
+        self.update_rows()
+        if self.rows is not None and len(self.rows) > count:
+            rows = self.rows
+            self.rows = rows[:count]
+            self.beginInsertRows(QModelIndex(), count, len(rows) - 1)
+            self.rows = rows
+            self.endInsertRows()
+
+        self.layoutChanged.emit()
+
+
+    def index(self, row, col, parent=QModelIndex()):
+        if parent.isValid():
+            return QModelIndex()
+
+        return self.createIndex(row, col)
+
+
+    def parent(self, index=QModelIndex()):
+        return QModelIndex()
+
+
+    def rowCount(self, parent=QModelIndex()):
+        if parent.isValid() or self.sourceModel() is None:
+            return 0
+
+        if self.rows is None:
+            return self.sourceModel().rowCount(QModelIndex())
+
+        return len(self.rows)
+
+
+    def columnCount(self, parent=QModelIndex()):
+        if parent.isValid() or self.sourceModel() is None:
+            return 0
+
+        return self.sourceModel().columnCount(QModelIndex())
+
+
+    def mapToSource(self, index):
+        if not index.isValid():
+            return QModelIndex()
+
+        row = index.row()
+        if self.rows is not None:
+            row = int(self.rows[row])
+
+        return self.sourceModel().index(row, index.column())
+
+
+    def mapFromSource(self, index):
+        if not index.isValid():
+            return QModelIndex()
+
+        if self.rows is None:
+            return self.index(index.row(), index.column())
+
+        if self.source_rows is None:
+            self.source_rows = {int(row): i for i, row in enumerate(self.rows)}
+
+        row = self.source_rows.get(index.row())
+        if row is None:
+            return QModelIndex()
+
+        return self.index(row, index.column())
+
+
+    def headerData(self, section, orientation, role):
+        return self.sourceModel().headerData(section, orientation, role)
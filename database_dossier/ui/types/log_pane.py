@@ -0,0 +1,98 @@
+"""
+    Database Dossier - A User Interface for your databases
+    Copyright (C) 2023  Nicholas Shiell
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+
+from collections import deque, OrderedDict
+from PyQt5.Qt import QObject
+from PyQt5.QtCore import *
+from PyQt5.QtWidgets import *
+from PyQt5.QtGui import *
+
+
+class LogPane(QObject):
+    """
+    Wraps the log's QTextEdit so entries are only ever added to the end
+
+    Each entry is highlighted once, when it is first shown, and inserted
+    with a cursor at the end of the document, so an entry costs the same
+    however long the log has grown. The document keeps at most
+    "max_blocks" lines, Qt drops the oldest ones as new ones arrive
+
+    While the log isn't visible entries wait in "pending", which is bounded
+    the same way, and are added when it is next shown. The HTML of recent
+    statements is kept in "cache" as the same ones are often run again,
+    like the pages of a table
+    """
+    max_blocks = 20000
+    max_pending = 5000
+    cache_size = 256
+
+    def __init__(self, parent, q_text, syntax_highlighter):
+        super().__init__(parent)
+        self.q_text = q_text
+        self.syntax_highlighter = syntax_highlighter
+        self.formatter = syntax_highlighter.create_formatter(q_text.styleSheet())
+        self.pending = deque(maxlen=self.max_pending)
+        self.cache = OrderedDict()
+        self.is_empty = True
+
+        self.doc = QTextDocument(parent)
+        self.doc.setDefaultStyleSheet(syntax_highlighter.style())
+        self.doc.setMaximumBlockCount(self.max_blocks)
+        self.doc.setUndoRedoEnabled(False)
+        self.q_text.setDocument(self.doc)
+
+
+    def append(self, sql):
+        self.pending.append(sql)
+        if self.q_text.isVisible():
+            self.flush()
+
+
+    def flush(self):
+        if not self.pending:
+            return None
+
+        scroll_bar = self.q_text.verticalScrollBar()
+        at_end = scroll_bar.value() == scroll_bar.maximum()
+
+        cursor = QTextCursor(self.doc)
+        cursor.movePosition(QTextCursor.End)
+        cursor.beginEditBlock()
+        while self.pending:
+            if not self.is_empty:
+                cursor.insertBlock()
+
+            cursor.insertHtml(self.highlighted(self.pending.popleft()))
+            self.is_empty = False
+        cursor.endEditBlock()
+
+        if at_end:
+            scroll_bar.setValue(scroll_bar.maximum())
+
+
+    def highlighted(self, sql):
+        html = self.cache.get(sql)
+        if html is None:
+            html = self.syntax_highlighter.highlight(sql, self.formatter)
+            self.cache[sql] = html
+            if len(self.cache) > self.cache_size:
+                self.cache.popitem(last=False)
+        else:
+            self.cache.move_to_end(sql)
+
+        return html
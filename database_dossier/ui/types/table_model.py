@@ -17,18 +17,115 @@
 """
 
 from numbers import Number
+from collections import OrderedDict
 from datetime import datetime, date
 from PyQt5.QtWidgets import *
 from PyQt5.QtCore import *
 from PyQt5.QtGui import *
+from ...result_set import ColumnarResultSet, DiskResultSet, Column
+from ... import diff
+from ...timings import format_bytes, format_count
+
+
+kind_null   = 'null'
+kind_error  = 'error'
+kind_number = 'number'
+kind_date   = 'date'
+kind_text   = 'text'
+
+kinds_from_column = {
+    Column.kind_int      : kind_number,
+    Column.kind_float    : kind_number,
+    Column.kind_date     : kind_date,
+    Column.kind_datetime : kind_date,
+    Column.kind_str      : kind_text,
+    Column.kind_bytes    : kind_text,
+}
+
 
 class TableModel(QAbstractTableModel):
+    """
+    Can be filled all at once with reset()
+    or streamed, where Qt asks for more rows as the view is scrolled
+    and fetch_more is called to request them, they arrive in append_rows()
+
+    The rows are kept in a ColumnarResultSet, once there are more than
+    "spill_rows" of them they are moved to a DiskResultSet
+
+    data() is called for every role of every visible cell on each repaint,
+    so the kind of each column (number, date, text) is worked out
+    when the rows arrive and the colours, fonts and alignments
+    are built once and looked up by kind
+
+    "diff_marks" are the rows a ResultDiff found added, removed or changed,
+    {row: (kind, changed columns)}, shown as the background of the row
+
+    Cells show at most "preview_chars" of a value, binary values as hex,
+    so a row of large BLOBs paints as fast as any other. The text shown
+    is kept in "previews" for the cells most recently painted
+    """
+    spill_rows = 100000
+    preview_chars = 256
+    previews_size = 5000
+
     def __init__(self, record_set_colors):
         self.headers = None
         self.record_set = None
         self.is_error = False
         self.record_set_colors = record_set_colors
+        self.job_id = None
+        self.fetch_more = None
+        self.fetch_pending = False
+        self.column_kinds = []
+        self.diff_marks = {}
+        self.previews = OrderedDict()
         super().__init__()
+        self.setup_role_values()
+
+
+    def setup_role_values(self):
+        italic = QFont()
+        italic.setItalic(True)
+
+        bold = QFont()
+        bold.setBold(True)
+
+        right = QVariant(Qt.AlignRight + Qt.AlignVCenter)
+        center = QVariant(Qt.AlignCenter + Qt.AlignVCenter)
+
+        self.diff_backgrounds = {
+            diff.added   : self.record_set_colors['added'],
+            diff.removed : self.record_set_colors['removed'],
+            diff.changed : self.record_set_colors['changed_row'],
+        }
+
+        self.role_values = {
+            Qt.TextColorRole: {
+                kind_error  : self.record_set_colors['error'],
+                kind_null   : self.record_set_colors['null'],
+                kind_date   : self.record_set_colors['date'],
+                kind_number : self.record_set_colors['number'],
+            },
+            Qt.TextAlignmentRole: {
+                kind_date   : right,
+                kind_number : right,
+                kind_null   : center,
+            },
+            Qt.FontRole: {
+                kind_null   : italic,
+                kind_number : bold,
+            },
+        }
+
+
+    def update_column_kinds(self):
+        """Only columns that have had nothing but nulls need looking at"""
+        if len(self.column_kinds) != len(self.record_set.columns):
+            self.column_kinds = [None] * len(self.record_set.columns)
+
+        for i, column in enumerate(self.record_set.columns):
+            if self.column_kinds[i] is None:
+                self.column_kinds[i] = column_kind(column)
     
     
     def headerData(self, col, orientation, role):
@@ -53,62 +150,197 @@ class TableModel(QAbstractTableModel):
     def update_emit(self):
         self.layoutChanged.emit()
 
+
+    def reset(self, headers, record_set, is_error=False, job_id=None):
+        self.beginResetModel()
+        if self.record_set is not None:
+            self.record_set.close()
+
+        self.headers = headers
+        if isinstance(record_set, (ColumnarResultSet, DiskResultSet)):
+            self.record_set = record_set
+        else:
+            self.record_set = ColumnarResultSet(len(headers), record_set)
+        self.spill_if_needed()
+        self.is_error = is_error
+        self.job_id = job_id
+        self.fetch_more = None
+        self.fetch_pending = False
+        self.column_kinds = []
+        self.diff_marks = {}
+        self.previews.clear()
+        self.update_column_kinds()
+        self.endResetModel()
+
+
+    def append_rows(self, rows, fetch_more=None):
+        self.fetch_pending = False
+        self.fetch_more = fetch_more
+        if not rows:
+            return None
+
+        first = len(self.record_set)
+        self.beginInsertRows(QModelIndex(), first, first + len(rows) - 1)
+        self.record_set.extend(rows)
+        self.spill_if_needed()
+        self.update_column_kinds()
+        self.endInsertRows()
+
+
+    def spill_if_needed(self):
+        if len(self.record_set) <= self.spill_rows:
+            return None
+
+        if isinstance(self.record_set, ColumnarResultSet):
+            self.record_set = DiskResultSet.from_result_set(self.record_set)
+
+
+    def set_diff_marks(self, marks):
+        self.diff_marks = marks
+        self.update_emit()
+
+
+    def canFetchMore(self, parent):
+        if parent.isValid():
+            return False
+
+        return self.fetch_more is not None and not self.fetch_pending
+
+
+    def fetchMore(self, parent):
+        if self.canFetchMore(parent):
+            self.fetch_pending = True
+            self.fetch_more()
+
     def data(self, index, role):
         if not index.isValid():
             return None
 
-        text = self.record_set[index.row()][index.column()]
-        if role == Qt.TextColorRole:
-            if self.is_error:
-                return self.record_set_colors['error']
-            if text is None:
-                return self.record_set_colors['null'];
-            if isinstance(text, datetime) or isinstance(text, date):
-                return self.record_set_colors['date']
-            if isinstance(text, Number):
-                return self.record_set_colors['number']
-
-        elif role == Qt.TextAlignmentRole:
-            right =  (
-                isinstance(text, datetime) or
-                isinstance(text, date) or
-                isinstance(text, Number)
-            )
-
-            if right:
-                return QVariant(Qt.AlignRight + Qt.AlignVCenter)
-
-            center = (
-                text is None
-            )
-
-            if center:
-                return QVariant(Qt.AlignCenter + Qt.AlignVCenter)
-
-        elif role == Qt.FontRole:
-            italic = (
-                text is None
-            )
-
-            if italic:
-                font = QFont()
-                font.setItalic(True)
-                return font
-
-            bold = (
-                isinstance(text, Number)
-            )
-
-            if bold:
-                font = QFont()
-                font.setBold(True)
-                return font
-
-        elif role == Qt.DisplayRole:
-            if isinstance(text, (bytes, bytearray)):
-                text = text.decode("utf-8")
-
-            if text is None:
-                return 'null'
-
-            return str(text)
+        row = index.row()
+        col = index.column()
+
+        if role == Qt.DisplayRole:
+            return self.preview(row, col)[0]
+
+        if role == Qt.ToolTipRole:
+            if self.preview(row, col)[1]:
+                return 'Shortened, View Value shows all of it'
+
+            return None
+
+        if role == Qt.BackgroundRole:
+            return self.diff_background(row, col)
+
+        if role not in self.role_values:
+            return None
+
+        if self.is_error:
+            kind = kind_error
+        elif self.record_set.is_null(row, col):
+            kind = kind_null
+        else:
+            kind = self.column_kinds[col]
+
+        return self.role_values[role].get(kind)
+
+
+    def preview(self, row, col):
+        """(text, whether it is shortened)"""
+        key = (row, col)
+        preview = self.previews.get(key)
+        if preview is not None:
+            self.previews.move_to_end(key)
+            return preview
+
+        preview = preview_text(self.record_set.value(row, col), self.preview_chars)
+        self.previews[key] = preview
+        if len(self.previews) > self.previews_size:
+            self.previews.popitem(last=False)
+
+        return preview
+
+
+    def diff_background(self, row, col):
+        mark = self.diff_marks.get(row)
+        if mark is None:
+            return None
+
+        kind, cols = mark
+        if kind == diff.changed and col in cols:
+            return self.record_set_colors['changed']
+
+        return self.diff_backgrounds[kind]
+
+
+def preview_text(value, length):
+    """
+    (text, shortened) for a cell. Binary is shown as hex with it's size,
+    only the start of a long value is decoded
+    """
+    if value is None:
+        return ('null', False)
+
+    if isinstance(value, (bytes, bytearray)):
+        head = bytes(value[:length * 4])
+        text = decode_head(head)
+        if text is None:
+            return ('%s%s [binary %s]' % (
+                head[:16].hex(' '),
+                '…' if len(value) > 16 else '',
+                format_bytes(len(value))
+            ), len(value) > 16)
+
+        if len(head) == len(value) and len(text) <= length:
+            return (text, False)
+
+        return ('%s… [%s]' % (text[:length], format_bytes(len(value))), True)
+
+    if isinstance(value, str):
+        if len(value) <= length:
+            return (value, False)
+
+        return ('%s… [%s chars]' % (value[:length], format_count(len(value))), True)
+
+    return (str(value), False)
+
+
+def decode_head(head):
+    """The bytes as UTF-8, a character cut off at the end is dropped
+    None for anything that isn't text"""
+    try:
+        text = head.decode('utf-8')
+    except UnicodeDecodeError as e:
+        if e.start < len(head) - 3 or e.reason != 'unexpected end of data':
+            return None
+
+        text = head[:e.start].decode('utf-8')
+
+    if '\x00' in text:
+        return None
+
+    return text
+
+
+def kind_from_value(value):
+    if isinstance(value, datetime) or isinstance(value, date):
+        return kind_date
+
+    if isinstance(value, Number):
+        return kind_number
+
+    return kind_text
+
+
+def column_kind(column):
+    if column.kind is Column.kind_none:
+        return None
+
+    if column.kind in kinds_from_column:
+        return kinds_from_column[column.kind]
+
+    # Object columns, go by the first value that isn't null
+    for i in range(len(column)):
+        if not column.is_null(i):
+            return kind_from_value(column.value(i))
+
+    return None
@@ -200,3 +200,83 @@ def should_execute_previous_sql(sql_before_cursor, sql_after_cursor):
         return False
 
     return True
+
+
+def split_sql_statements(sql):
+    """
+    Splits a script into it's statements on ';', or on the delimiter set
+    with a DELIMITER line, skipping over quoted text and comments
+    Statements that are only comments or whitespace are left out
+    """
+    statements = []
+    delimiter = ';'
+    start = 0
+    i = 0
+    length = len(sql)
+    quote = None
+    has_code = False
+
+    def add(end):
+        if has_code:
+            statements.append(sql[start:end].strip())
+
+    while i < length:
+        char = sql[i]
+
+        if quote:
+            if char == '\\' and quote != '`':
+                i+= 2
+                continue
+
+            if char == quote:
+                quote = None
+
+            i+= 1
+            continue
+
+        is_dash_comment = sql.startswith('--', i) and (
+            i + 2 >= length or sql[i + 2] in ' \t\r\n'
+        )
+
+        if is_dash_comment or char == '#':
+            end = sql.find('\n', i)
+            i = length if end == -1 else end
+            continue
+
+        if sql.startswith('/*', i):
+            end = sql.find('*/', i + 2)
+            i = length if end == -1 else end + 2
+            continue
+
+        is_delimiter_command = (
+            not has_code and
+            sql[i:i + 9].upper() == 'DELIMITER' and
+            sql[i + 9:i + 10] in (' ', '\t')
+        )
+
+        if is_delimiter_command:
+            end = sql.find('\n', i)
+            end = length if end == -1 else end
+            delimiter = sql[i + 9:end].strip() or ';'
+            i = end
+            start = i
+            continue
+
+        if sql.startswith(delimiter, i):
+            add(i)
+            i+= len(delimiter)
+            start = i
+            has_code = False
+            continue
+
+        if quote is None and char in '\'"`':
+            quote = char
+
+        if not char.isspace():
+            has_code = True
+
+        i+= 1
+
+    add(length)
+
+    return statements
@@ -0,0 +1,180 @@
+#! /usr/bin/python3
+"""
+Measures how long a QTableView takes to scroll through and repaint
+a synthetic 100,000 x 50 result set
+
+"before" is the TableModel as it was, a list of tuples and per-cell
+isinstance() checks, "after" is the TableModel as it is now
+
+Run from the root of the repository:
+    QT_QPA_PLATFORM=offscreen python3 tools/benchmark-table-model.py
+"""
+
+import os, sys, time, random
+from numbers import Number
+from datetime import datetime, date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.realpath(__file__))))
+
+from PyQt5.QtWidgets import *
+from PyQt5.QtCore import *
+from PyQt5.QtGui import *
+from database_dossier.ui.types import TableModel
+
+
+rows_count = 100000
+columns_count = 50
+scroll_steps = 200
+rounds = 5
+
+
+class BeforeTableModel(QAbstractTableModel):
+    """The TableModel as it was, rows kept as a list of tuples"""
+    def __init__(self, record_set_colors):
+        self.headers = None
+        self.record_set = None
+        self.is_error = False
+        self.record_set_colors = record_set_colors
+        super().__init__()
+
+
+    def reset(self, headers, record_set):
+        self.beginResetModel()
+        self.headers = headers
+        self.record_set = record_set
+        self.endResetModel()
+
+
+    def headerData(self, col, orientation, role):
+        if orientation == Qt.Horizontal and role == Qt.DisplayRole:
+            if self.headers:
+                return self.headers[col]
+
+        return None
+
+
+    def rowCount(self, parent):
+        if self.record_set:
+            return len(self.record_set)
+
+        return 0
+
+
+    def columnCount(self, parent):
+        if self.headers:
+            return len(self.headers)
+
+        return 0
+
+
+    def data(self, index, role):
+        if not index.isValid():
+            return None
+
+        text = self.record_set[index.row()][index.column()]
+        if role == Qt.TextColorRole:
+            if self.is_error:
+                return self.record_set_colors['error']
+            if text is None:
+                return self.record_set_colors['null'];
+            if isinstance(text, datetime) or isinstance(text, date):
+                return self.record_set_colors['date']
+            if isinstance(text, Number):
+                return self.record_set_colors['number']
+
+        elif role == Qt.TextAlignmentRole:
+            if isinstance(text, (datetime, date, Number)):
+                return QVariant(Qt.AlignRight + Qt.AlignVCenter)
+
+            if text is None:
+                return QVariant(Qt.AlignCenter + Qt.AlignVCenter)
+
+        elif role == Qt.FontRole:
+            if text is None:
+                font = QFont()
+                font.setItalic(True)
+                return font
+
+            if isinstance(text, Number):
+                font = QFont()
+                font.setBold(True)
+                return font
+
+        elif role == Qt.DisplayRole:
+            if isinstance(text, (bytes, bytearray)):
+                text = text.decode("utf-8")
+
+            if text is None:
+                return 'null'
+
+            return str(text)
+
+
+def synthetic_rows():
+    random.seed(1)
+    start = datetime(2020, 1, 1)
+    makers = [
+        lambda i: i,
+        lambda i: random.random() * 1000,
+        lambda i: 'text %d' % random.randint(0, 100000),
+        lambda i: start + timedelta(minutes=i),
+        lambda i: None if i % 3 else i,
+    ]
+
+    return [
+        tuple(makers[col % len(makers)](i) for col in range(columns_count))
+        for i in range(rows_count)
+    ]
+
+
+def measure(model_class, rows, colors):
+    model = model_class(colors)
+    model.reset(['c%d' % i for i in range(columns_count)], rows)
+
+    view = QTableView()
+    view.resize(1600, 1000)
+    view.setModel(model)
+    view.show()
+    QApplication.processEvents()
+
+    scroll_bar = view.verticalScrollBar()
+    step = max(1, scroll_bar.maximum() // scroll_steps)
+
+    # The best of a few rounds, as painting times vary a lot from run to run
+    best = None
+    for r in range(rounds):
+        scroll_bar.setValue(0)
+        QApplication.processEvents()
+
+        started = time.perf_counter()
+        for i in range(scroll_steps):
+            scroll_bar.setValue(i * step)
+            view.viewport().repaint()
+
+        seconds = time.perf_counter() - started
+        best = seconds if best is None else min(best, seconds)
+
+    return best
+
+
+if __name__ == '__main__':
+    app = QApplication(sys.argv)
+    colors = {
+        'null'   : QVariant(QColor(Qt.gray)),
+        'error'  : QVariant(QColor(Qt.red)),
+        'number' : QVariant(QColor(Qt.darkGreen)),
+        'date'   : QVariant(QColor(255, 0, 255)),
+        'added'       : QVariant(QColor(210, 245, 210)),
+        'removed'     : QVariant(QColor(250, 215, 215)),
+        'changed_row' : QVariant(QColor(250, 245, 205)),
+        'changed'     : QVariant(QColor(245, 220, 120))
+    }
+
+    rows = synthetic_rows()
+    before = measure(BeforeTableModel, rows, colors)
+    after = measure(TableModel, rows, colors)
+
+    print('%d x %d, %d scroll repaints, best of %d' % (
+        rows_count, columns_count, scroll_steps, rounds))
+    print('before: %.3fs (%.2fms per repaint)' % (before, before * 1000 / scroll_steps))
+    print('after:  %.3fs (%.2fms per repaint)' % (after, after * 1000 / scroll_steps))